@@ -1,4 +1,4 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
 from .models import Comment, Post
 
@@ -8,13 +8,42 @@ class PostAdmin(admin.ModelAdmin):
     readonly_fields = ['author', 'text', 'heading', 'short_definition', 'pub_date', 'is_published']
     search_fields = ['author__username', 'heading']
     date_hierarchy = 'pub_date'
+    actions = ['publish_posts', 'unpublish_posts']
+
+    def set_published(self, request, queryset, is_published):
+        posts = queryset.exclude(is_published=is_published).only('id', 'author_id', 'is_published', 'pub_date')
+        for post in posts:
+            post.publish(is_published)
+        return len(posts)
+
+    @admin.action(description='Publish selected posts')
+    def publish_posts(self, request, queryset):
+        updated = self.set_published(request, queryset, True)
+        self.message_user(request, f'{updated} posts have been published.', messages.SUCCESS)
+
+    @admin.action(description='Unpublish selected posts')
+    def unpublish_posts(self, request, queryset):
+        updated = self.set_published(request, queryset, False)
+        self.message_user(request, f'{updated} posts have been unpublished.', messages.SUCCESS)
 
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = ['author', 'is_published']
+    list_filter = ['is_published']
     readonly_fields = ['author', 'text', 'post']
     search_fields = ['author__username']
     date_hierarchy = 'pub_date'
+    actions = ['publish_comments', 'unpublish_comments']
+
+    @admin.action(description='Publish selected comments')
+    def publish_comments(self, request, queryset):
+        updated = Comment.set_published(queryset, True)
+        self.message_user(request, f'{updated} comments have been published.', messages.SUCCESS)
+
+    @admin.action(description='Unpublish selected comments')
+    def unpublish_comments(self, request, queryset):
+        updated = Comment.set_published(queryset, False)
+        self.message_user(request, f'{updated} comments have been unpublished.', messages.SUCCESS)
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,155 @@
+import math
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Comment, Post, User
+from .pagination import KeysetPaginator
+
+# How deep into a list the "deep page" scenarios start, as a share of its length.
+DEEP_PAGE = 0.9
+PERCENTILES = (50, 90, 95, 99)
+
+SCENARIOS = [
+    # (label, url name, logged in, url kwargs, query string), the callables take the prepared context.
+    ('index', 'blog:index', False, None, None),
+    ('registration_form', 'blog:registration_form', False, None, None),
+    ('profile_update', 'blog:profile_update', True, lambda c: {'pk': c['author'].pk}, None),
+    ('posts_list', 'blog:posts_list', False, None, None),
+    ('posts_list deep', 'blog:posts_list', False, None, lambda c: {'cursor': c['posts_cursor']}),
+    ('post_create_form', 'blog:post_create_form', True, lambda c: {'pk': c['author'].pk}, None),
+    ('post_details big thread', 'blog:post_details', False, lambda c: {'pk': c['thread'].pk}, None),
+    ('author_info', 'blog:author_info', False, lambda c: {'pk': c['author'].pk}, None),
+    ('my_posts', 'blog:my_posts', True, lambda c: {'pk': c['author'].pk}, None),
+    ('my_posts deep', 'blog:my_posts', True, lambda c: {'pk': c['author'].pk},
+     lambda c: {'cursor': c['my_posts_cursor']}),
+    ('post_update', 'blog:post_update', True, lambda c: {'pk': c['own_post'].pk}, None),
+    ('comments_list big thread', 'blog:comments_list', False, lambda c: {'pk': c['thread'].pk}, None),
+    ('comments_list big thread deep', 'blog:comments_list', False, lambda c: {'pk': c['thread'].pk},
+     lambda c: {'cursor': c['comments_cursor']}),
+    ('comments_feed big thread deep', 'blog:comments_feed', False, lambda c: {'pk': c['thread'].pk},
+     lambda c: {'cursor': c['comments_cursor']}),
+    ('search', 'blog:search', False, None, lambda c: {'q': c['search_term']}),
+    ('send_feedback', 'blog:send_feedback', False, None, None),
+]
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def deep_cursor(queryset, depth=DEEP_PAGE):
+    """A 'next' cursor starting depth of the way into queryset, in the views' (-pub_date, -id) order."""
+    queryset = queryset.order_by('-pub_date', '-id')
+    total = queryset.count()
+    if total < 2:
+        return ''
+    return KeysetPaginator(queryset, 1).encode_cursor(queryset[int((total - 1) * depth)], 'next')
+
+
+def prepare():
+    """Picks the worst cases of the dataset: the most prolific author and the longest comment thread."""
+    author_id = (Post.objects.values('author_id').annotate(posts=Count('id')).order_by('-posts', 'author_id')
+                 .values_list('author_id', flat=True).first())
+    thread = Post.objects.filter(is_published=True).order_by('-comment_count', 'id').first()
+    if author_id is None or thread is None:
+        raise BenchmarkError('The dataset has no published post.')
+    words = [word.strip('.,').lower() for word in thread.heading.split()]
+    return {
+        'author': User.objects.get(pk=author_id),
+        'own_post': Post.objects.filter(author_id=author_id).order_by('-pub_date').first(),
+        'thread': thread,
+        'posts_cursor': deep_cursor(Post.objects.filter(is_published=True)),
+        'my_posts_cursor': deep_cursor(Post.objects.filter(author_id=author_id)),
+        'comments_cursor': deep_cursor(Comment.objects.filter(post=thread, is_published=True)),
+        'search_term': max(words, key=len),
+    }
+
+
+def percentile(ordered, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(math.ceil(len(ordered) * percent / 100) - 1, 0)]
+
+
+def summarize(timings, queries):
+    ordered = sorted(timings)
+    stats = {'queries': queries, 'requests': len(ordered)}
+    stats.update({f'p{percent}': round(percentile(ordered, percent) * 1000, 3) for percent in PERCENTILES})
+    stats['max'] = round(ordered[-1] * 1000, 3)
+    stats['mean'] = round(sum(ordered) / len(ordered) * 1000, 3)
+    stats['rps'] = round(len(ordered) / sum(ordered), 1)
+    return stats
+
+
+def measure(request, requests, cold):
+    """Times requests calls of request(); a cold run clears the cache before each of them, outside the timing."""
+    if cold:
+        cache.clear()
+    # One untimed request counts the queries, query logging would skew the timings.
+    with CaptureQueriesContext(connection) as captured:
+        request()
+    queries = len(captured)
+    timings = []
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        started = time.perf_counter()
+        request()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings, queries)
+
+
+def run(anonymous, logged_in, context, requests=50, warmup=5, scenarios=SCENARIOS, progress=None):
+    """
+    Runs every scenario with the anonymous or logged in test client and returns
+    {label: {'url', 'cold': stats, 'warm': stats}}, timings in milliseconds.
+    """
+    results = {}
+    for label, name, needs_login, url_kwargs, query in scenarios:
+        client = logged_in if needs_login else anonymous
+        url = reverse(name, kwargs=url_kwargs(context) if url_kwargs else None)
+        data = query(context) if query else None
+
+        def request():
+            response = client.get(url, data)
+            if response.status_code != 200:
+                raise BenchmarkError(f'{label}: GET {url} returned {response.status_code}.')
+            return response
+
+        cold = measure(request, requests, cold=True)
+        for _ in range(warmup):
+            request()
+        warm = measure(request, requests, cold=False)
+        results[label] = {'url': url, 'cold': cold, 'warm': warm}
+        if progress is not None:
+            progress(label, results[label])
+    return results
+
+
+def compare(baseline, current, threshold=0.2, min_delta=1.0, metrics=('p50', 'p95')):
+    """
+    Lists the regressions of current against baseline, both {scale: {'dataset', 'routes'}}: any extra
+    query, or a latency metric more than threshold (a ratio) and min_delta milliseconds slower.
+    """
+    regressions = []
+    for scale, result in current.items():
+        before = baseline.get(scale)
+        if before is None or before['dataset'] != result['dataset']:
+            continue
+        for label, route in result['routes'].items():
+            if label not in before['routes']:
+                continue
+            for mode in ('cold', 'warm'):
+                old, new = before['routes'][label][mode], route[mode]
+                if new['queries'] > old['queries']:
+                    regressions.append(f'{scale} {label} ({mode}): {old["queries"]} -> {new["queries"]} queries')
+                for metric in metrics:
+                    delta = new[metric] - old[metric]
+                    if delta > min_delta and delta > old[metric] * threshold:
+                        regressions.append(f'{scale} {label} ({mode}): {metric} {old[metric]:.2f} -> '
+                                           f'{new[metric]:.2f} ms (+{delta / old[metric]:.0%})')
+    return regressions
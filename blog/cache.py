@@ -0,0 +1,147 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .profiling import record
+
+TAG_PREFIX = 'cache-tag:'
+# Part of every tag's version, bumped by invalidate_all() after bulk writes that bypass the signals.
+SITE_TAG = 'site'
+METRIC_PREFIX = 'cache-metrics:'
+METRICS = ('hits', 'misses', 'invalidations')
+
+
+def incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, None)
+        return cache.incr(key, delta)
+
+
+def record_metric(name, delta=1):
+    incr(METRIC_PREFIX + name, delta)
+    record(name, delta)
+
+
+def cache_metrics():
+    values = cache.get_many([METRIC_PREFIX + name for name in METRICS])
+    return {name: values.get(METRIC_PREFIX + name, 0) for name in METRICS}
+
+
+def reset_cache_metrics():
+    cache.delete_many([METRIC_PREFIX + name for name in METRICS])
+
+
+def tag_timeout():
+    # A per-process cache never sees the invalidations made by other processes,
+    # its tags expire with the entries so nothing outlives BLOG_VIEW_CACHE_TIMEOUT.
+    return None if settings.BLOG_SHARED_CACHE else settings.BLOG_VIEW_CACHE_TIMEOUT
+
+
+def tag_versions(tags):
+    keys = [TAG_PREFIX + tag for tag in (SITE_TAG, *tags)]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # A time based initial version means an evicted tag never reuses an old version number.
+        cache.set_many(missing, tag_timeout())
+        versions.update(missing)
+    site = versions[keys[0]]
+    return [f'{site}.{versions[key]}' for key in keys[1:]]
+
+
+def invalidate(*tags):
+    """Bumps the tags' versions once the current transaction commits, orphaning every entry built on them."""
+    def bump():
+        for tag in tags:
+            try:
+                cache.incr(TAG_PREFIX + tag)
+            except ValueError:
+                cache.set(TAG_PREFIX + tag, time.time_ns(), tag_timeout())
+        record_metric('invalidations', len(tags))
+    transaction.on_commit(bump)
+
+
+def invalidate_all():
+    """Invalidates every cached page and ETag, for bulk writes made without the model signals."""
+    invalidate(SITE_TAG)
+
+
+def tagged_key(prefix, tags, *parts):
+    versions = '.'.join(str(version) for version in tag_versions(tags))
+    digest = hashlib.md5(':'.join([versions, *map(str, parts)]).encode()).hexdigest()
+    return f'{prefix}:{digest}'
+
+
+def cache_view(timeout, tags, vary_on_user=True):
+    """
+    Caches GET responses under the versions of the given tags, so an
+    invalidate() of any of them makes the entry unreachable immediately.
+    tags is a list of tag names or a callable taking the view arguments.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            # Flash messages are rendered into the page and must not be cached or skipped.
+            if request.method != 'GET' or len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            view_tags = tags(request, *args, **kwargs) if callable(tags) else tags
+            user_id = request.user.id if vary_on_user else None
+            key = tagged_key('view', view_tags, user_id, request.get_full_path())
+            response = cache.get(key)
+            if response is not None:
+                record_metric('hits')
+                return response
+
+            record_metric('misses')
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                if hasattr(response, 'render') and callable(response.render):
+                    response.add_post_render_callback(lambda rendered: cache.set(key, rendered, timeout))
+                else:
+                    cache.set(key, response, timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_view(tags):
+    """
+    Answers conditional GETs with 304 Not Modified before the view, the view cache or the templates run.
+    The ETag hashes the user, the full path and the versions of the given cache tags, which every write
+    the page depends on bumps, so a revalidation costs no query. tags is a list of tag names or a callable
+    taking the view arguments. No Last-Modified is sent: no single timestamp covers unpublished or deleted
+    rows and renamed authors.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+            view_tags = tags(request, *args, **kwargs) if callable(tags) else tags
+            digest = hashlib.md5(':'.join(map(str, [
+                request.user.id, request.get_full_path(), *view_tags, *tag_versions(view_tags),
+            ])).encode()).hexdigest()
+            etag = quote_etag(digest)
+
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response.headers['ETag'] = etag
+            # Pages differ per user, clients and proxies keep them but revalidate on every use.
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
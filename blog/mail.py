@@ -0,0 +1,130 @@
+import smtplib
+import threading
+import time
+from functools import lru_cache
+
+from celery.signals import worker_process_init, worker_process_shutdown
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.template import Context, Engine, engines
+
+HEALTHCHECK_AFTER = 30
+
+_pool = threading.local()
+
+
+def is_alive(connection):
+    if not hasattr(connection, 'connection'):
+        # Console, locmem and file backends have no server connection to lose.
+        return True
+    if connection.connection is None:
+        return False
+    try:
+        return connection.connection.noop()[0] == 250
+    except (smtplib.SMTPException, OSError):
+        return False
+
+
+def close_pooled_connection(**kwargs):
+    connection = getattr(_pool, 'connection', None)
+    if connection is not None:
+        try:
+            connection.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+    _pool.connection = None
+
+
+def pooled_connection():
+    """
+    Returns this worker's mail connection, opening it on first use. A connection
+    idle for more than HEALTHCHECK_AFTER seconds is checked with NOOP and reopened if dead.
+    """
+    connection = getattr(_pool, 'connection', None)
+    if connection is not None and getattr(_pool, 'backend', None) != settings.EMAIL_BACKEND:
+        close_pooled_connection()
+        connection = None
+
+    if connection is None:
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        _pool.connection, _pool.backend = connection, settings.EMAIL_BACKEND
+    elif time.monotonic() - _pool.last_used > HEALTHCHECK_AFTER and not is_alive(connection):
+        close_pooled_connection()
+        connection = get_connection(fail_silently=False)
+        connection.open()
+        _pool.connection = connection
+
+    _pool.last_used = time.monotonic()
+    return connection
+
+
+def send_messages(messages):
+    """
+    Sends messages over the pooled connection one at a time, so that when the server drops the
+    connection only the message that failed is retried, once, after reconnecting.
+    """
+    sent = 0
+    for message in messages:
+        try:
+            sent += pooled_connection().send_messages([message])
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            close_pooled_connection()
+            sent += pooled_connection().send_messages([message])
+    return sent
+
+
+def send_mail(subject, message, from_email, recipient_list, html_message=None):
+    mail = EmailMultiAlternatives(subject, message, from_email, recipient_list)
+    if html_message:
+        mail.attach_alternative(html_message, 'text/html')
+    return send_messages([mail])
+
+
+def send_mass_mail(datatuple):
+    """Like django.core.mail.send_mass_mail, but over the pooled connection."""
+    return send_messages([EmailMessage(subject, message, from_email, recipient_list)
+                          for subject, message, from_email, recipient_list in datatuple])
+
+
+@lru_cache(maxsize=None)
+def email_engine():
+    """
+    The worker's own template engine for emails: same dirs and libraries as the
+    project engine, but always with the cached loader, debug off and no context processors.
+    """
+    project_engine = engines['django'].engine
+    return Engine(
+        dirs=project_engine.dirs,
+        loaders=[('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])],
+        libraries=project_engine.libraries,
+        builtins=[name for name in project_engine.builtins if name not in Engine.default_builtins],
+        autoescape=project_engine.autoescape,
+    )
+
+
+def render_many(template_name, contexts):
+    """Renders one compiled template once per context."""
+    template = email_engine().get_template(template_name)
+    return [template.render(Context(context, autoescape=template.engine.autoescape)) for context in contexts]
+
+
+def render_email(template_name, context):
+    return render_many(template_name, [context])[0]
+
+
+@worker_process_init.connect
+def open_pooled_connection(**kwargs):
+    email_engine()
+    try:
+        pooled_connection()
+    except (smtplib.SMTPException, OSError):
+        # The mail server may come up later, the first task will connect then.
+        close_pooled_connection()
+
+
+worker_process_shutdown.connect(close_pooled_connection)
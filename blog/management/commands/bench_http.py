@@ -0,0 +1,120 @@
+import json
+import platform
+import subprocess
+
+from blog import benchmarks
+from blog.seeding import positive_int
+from blog.storage import plain_storages
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+SCALES = {
+    # name: (users, posts, comments)
+    'small': (100, 1000, 10000),
+    'medium': (1000, 10000, 100000),
+    'large': (5000, 100000, 1000000),
+}
+
+
+def scale(value):
+    """A preset name, or users:posts:comments."""
+    if value in SCALES:
+        return value, SCALES[value]
+    users, posts, comments = (positive_int(number) for number in value.split(':'))
+    return value, (users, posts, comments)
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway database at each scale and measures latency percentiles, throughput and '  # noqa: A003
+            'queries of every blog page, on a cold and a warm cache. Fails on regressions against --baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', nargs='+', type=scale, default=[scale('small'), scale('medium')],
+                            help=f'Presets ({", ".join(SCALES)}) or users:posts:comments.')
+        parser.add_argument('--requests', type=positive_int, default=50, help='Timed requests per page and cache.')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests before the warm measurements.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Writes the results to this JSON file.')
+        parser.add_argument('--baseline', help='Results JSON of an earlier run to compare against.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Tolerated latency increase over the baseline, as a ratio.')
+        parser.add_argument('--min-delta', type=float, default=1.0,
+                            help='Latency increases below this many milliseconds are noise, not regressions.')
+
+    def handle(self, *args, **kwargs):
+        baseline = None
+        if kwargs['baseline']:
+            with open(kwargs['baseline'], encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+
+        results = {
+            'meta': {
+                'started': timezone.now().isoformat(), 'revision': revision(), 'python': platform.python_version(),
+                'django': django.get_version(), 'database': connection.vendor, 'seed': kwargs['seed'],
+                'requests': kwargs['requests'], 'warmup': kwargs['warmup'],
+            },
+            'scales': {},
+        }
+        # A private cache, so clearing it doesn't flush a shared Redis, and no debug overhead in the timings.
+        with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'], STORAGES=plain_storages(),
+                               CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            for name, dataset in kwargs['scales']:
+                results['scales'][name] = self.bench_scale(name, dataset, kwargs)
+
+        if kwargs['output']:
+            with open(kwargs['output'], 'w', encoding='utf-8') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f'Results written to {kwargs["output"]}')
+
+        if baseline is not None:
+            regressions = benchmarks.compare(baseline['scales'], results['scales'], kwargs['threshold'],
+                                             kwargs['min_delta'])
+            skipped = [name for name, result in results['scales'].items()
+                       if baseline['scales'].get(name, {}).get('dataset') != result['dataset']]
+            if skipped:
+                self.stdout.write(self.style.WARNING(f'Not in the baseline, not compared: {", ".join(skipped)}'))
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regression against the baseline.'))
+
+    def bench_scale(self, name, dataset, kwargs):
+        users, posts, comments = dataset
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: {users} users, {posts} posts, {comments} comments'))
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            call_command('seed_dataset', users=users, posts=posts, comments=comments, seed=kwargs['seed'],
+                         stdout=self.stdout)
+            context = benchmarks.prepare()
+            logged_in = Client()
+            logged_in.force_login(context['author'])
+            self.stdout.write(f'{"page":<32} {"cold p50":>9} {"p95":>9} {"warm p50":>9} {"p95":>9} '
+                              f'{"req/s":>8} {"queries":>8}')
+            try:
+                routes = benchmarks.run(Client(), logged_in, context, kwargs['requests'], kwargs['warmup'],
+                                        progress=self.report)
+            except benchmarks.BenchmarkError as exc:
+                raise CommandError(exc)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        dataset = {'users': users, 'posts': posts, 'comments': comments, 'seed': kwargs['seed']}
+        return {'dataset': dataset, 'routes': routes}
+
+    def report(self, label, result):
+        cold, warm = result['cold'], result['warm']
+        self.stdout.write(f'{label:<32} {cold["p50"]:>9.2f} {cold["p95"]:>9.2f} {warm["p50"]:>9.2f} '
+                          f'{warm["p95"]:>9.2f} {warm["rps"]:>8.0f} {cold["queries"]:>4}/{warm["queries"]:<3}')
@@ -0,0 +1,47 @@
+import time
+
+from blog import mail
+
+from django.core.mail import get_connection, send_mail
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+
+class Command(BaseCommand):
+    help = 'Compares per-message SMTP connections with the pooled and batched paths (needs aiosmtpd).'  # noqa: A003
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200)
+        parser.add_argument('--port', type=int, default=8025)
+
+    def handle(self, *args, **kwargs):
+        try:
+            from aiosmtpd.controller import Controller
+            from aiosmtpd.handlers import Sink
+        except ImportError:
+            raise CommandError('bench_mail needs aiosmtpd: pip install aiosmtpd')
+
+        quantity = kwargs['messages']
+        port = kwargs['port']
+        message = ('Benchmark', 'Body', 'from@example.com', ['admin@example.com'])
+        controller = Controller(Sink(), hostname='127.0.0.1', port=port)
+        controller.start()
+        try:
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                                   EMAIL_HOST='127.0.0.1', EMAIL_PORT=port, EMAIL_USE_TLS=False,
+                                   EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD=''):
+                self.report('send_mail, connection per message', quantity,
+                            lambda: [send_mail(*message, connection=get_connection()) for _ in range(quantity)])
+                self.report('pooled connection', quantity,
+                            lambda: [mail.send_mail(*message) for _ in range(quantity)])
+                self.report('pooled send_mass_mail', quantity,
+                            lambda: mail.send_mass_mail([message] * quantity))
+                mail.close_pooled_connection()
+        finally:
+            controller.stop()
+
+    def report(self, name, quantity, send):
+        start = time.perf_counter()
+        send()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{name:<40} {quantity / elapsed:>10.1f} messages/sec')
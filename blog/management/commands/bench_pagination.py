@@ -0,0 +1,38 @@
+import timeit
+
+from blog.models import Comment, Post
+from blog.pagination import KeysetPaginator
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compares OFFSET and keyset page fetch times at increasing page depths.'  # noqa: A003
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=['post', 'comment'], default='post')
+        parser.add_argument('--per-page', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **kwargs):
+        model = Post if kwargs['model'] == 'post' else Comment
+        per_page = kwargs['per_page']
+        repeat = kwargs['repeat']
+        queryset = model.objects.filter(is_published=True).order_by('-pub_date', '-id')
+        total = queryset.count()
+        last_page = max(total // per_page, 1)
+        depths = sorted({1, max(last_page // 100, 1), max(last_page // 10, 1), max(last_page // 2, 1), last_page})
+
+        keyset = KeysetPaginator(queryset, per_page)
+        self.stdout.write(f'{total} published {kwargs["model"]}s, {per_page} per page, best of {repeat} runs')
+        self.stdout.write(f'{"page":>10} {"offset ms":>12} {"keyset ms":>12}')
+        for depth in depths:
+            start = (depth - 1) * per_page
+            cursor = None
+            if start:
+                cursor = keyset.encode_cursor(queryset[start - 1], 'next')
+            offset_time = min(timeit.repeat(lambda: list(queryset[start:start + per_page]), number=1, repeat=repeat))
+            keyset_time = min(timeit.repeat(lambda: list(keyset.page(cursor)), number=1, repeat=repeat))
+            self.stdout.write(f'{depth:>10} {offset_time * 1000:>12.3f} {keyset_time * 1000:>12.3f}')
+        count_time = timeit.timeit(queryset.count, number=1)
+        self.stdout.write(f'COUNT(*) per OFFSET page render: {count_time * 1000:.3f} ms')
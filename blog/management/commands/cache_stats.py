@@ -0,0 +1,19 @@
+from blog.cache import cache_metrics, reset_cache_metrics
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Prints view cache hit/miss/invalidation counters.'  # noqa: A003
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after printing them.')
+
+    def handle(self, *args, **kwargs):
+        metrics = cache_metrics()
+        lookups = metrics['hits'] + metrics['misses']
+        ratio = metrics['hits'] / lookups if lookups else 0
+        self.stdout.write(f"hits: {metrics['hits']}, misses: {metrics['misses']}, "
+                          f"invalidations: {metrics['invalidations']}, hit ratio: {ratio:.1%}")
+        if kwargs['reset']:
+            reset_cache_metrics()
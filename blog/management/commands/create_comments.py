@@ -1,28 +1,35 @@
-from blog.models import Comment, Post
+import random
+from collections import Counter
 
-from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
+from blog.cache import invalidate_all
+from blog.models import Comment, Post, SiteCounter
+from blog.seeding import SeedCommand, add_to_column, assign, comment_rows, generate, insert
 
-from faker import Faker
+from django.core.management.base import CommandError
 
-User = get_user_model()
-fake = Faker()
 
-
-class Command(BaseCommand):
-    help = 'Creates comments for database (from 10 to 1000).'  # noqa: A003
-
-    def add_arguments(self, parser):
-        parser.add_argument('quantity', type=int, choices=range(10, 1001))
+class Command(SeedCommand):
+    help = 'Creates published comments for database, on random existing posts.'  # noqa: A003
 
     def handle(self, *args, **kwargs):
         quantity = kwargs['quantity']
-        comments_list = []
-        for number in range(quantity):
-            comments_list.append(Comment(author=fake.user_name(),
-                                         post_id=Post.objects.values_list("id", flat=True).order_by('?').first(),
-                                         text=fake.paragraph(nb_sentences=5),
-                                         is_published=True,
-                                         ))
-        Comment.objects.bulk_create(comments_list)
+        post_ids = list(Post.objects.values_list('id', flat=True))
+        if not post_ids:
+            raise CommandError('Create some posts first.')
+        rng = random.Random(kwargs['seed'])
+        added = Counter()
+
+        def prepare(rows):
+            assign(rows, 'post_id', post_ids, rng)
+            for row in rows:
+                row['is_published'] = True
+            added.update(row['post_id'] for row in rows)
+
+        batches = generate(comment_rows, quantity, kwargs['batch_size'], kwargs['workers'], kwargs['seed'])
+        insert(Comment, batches, prepare, self.progress('comments', quantity), kwargs['batch_size'])
+        SiteCounter.increment(SiteCounter.COMMENTS, quantity)
+        add_to_column(Post, 'comment_count', added)
+        invalidate_all()
         self.stdout.write(f"{quantity} comments have been created in database!")
+        self.stdout.write('Run rebuild_leaderboard and rebuild_search_index to include them in the leaderboard '
+                          'and search.')
@@ -1,29 +1,32 @@
-from blog.models import Post
+import random
 
-from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
+from blog.cache import invalidate_all
+from blog.models import Post, SiteCounter
+from blog.seeding import SeedCommand, assign, generate, insert, post_rows
 
-from faker import Faker
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
 
 User = get_user_model()
-fake = Faker()
-
 
-class Command(BaseCommand):
-    help = 'Creates posts for database (from 10 to 1000).'  # noqa: A003
 
-    def add_arguments(self, parser):
-        parser.add_argument('quantity', type=int, choices=range(10, 1001))
+class Command(SeedCommand):
+    help = 'Creates published posts for database, by random existing users.'  # noqa: A003
 
     def handle(self, *args, **kwargs):
         quantity = kwargs['quantity']
-        posts_list = []
-        for number in range(quantity):
-            posts_list.append(Post(heading=fake.sentence(nb_words=5),
-                                   text=fake.text(),
-                                   short_definition=fake.paragraph(nb_sentences=3),
-                                   is_published=True,
-                                   author_id=User.objects.values_list("id", flat=True).order_by('?').first(),
-                                   ))
-        Post.objects.bulk_create(posts_list)
+        author_ids = list(User.objects.values_list('id', flat=True))
+        if not author_ids:
+            raise CommandError('Create some users first.')
+        rng = random.Random(kwargs['seed'])
+
+        def prepare(rows):
+            assign(rows, 'author_id', author_ids, rng)
+            for row in rows:
+                row['is_published'] = True
+
+        batches = generate(post_rows, quantity, kwargs['batch_size'], kwargs['workers'], kwargs['seed'])
+        insert(Post, batches, prepare, self.progress('posts', quantity), kwargs['batch_size'])
+        SiteCounter.increment(SiteCounter.POSTS, quantity)
+        invalidate_all()
         self.stdout.write(f"{quantity} posts have been created in database!")
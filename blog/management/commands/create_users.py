@@ -1,27 +1,33 @@
+from blog.cache import invalidate_all
+from blog.models import SiteCounter
+from blog.seeding import SeedCommand, generate, insert, user_rows
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import make_password
-from django.core.management.base import BaseCommand
-
-from faker import Faker
+from django.db.models import Max
 
 User = get_user_model()
-fake = Faker()
 
 
-class Command(BaseCommand):
-    help = 'Creates users for database (from 10 to 1000).'  # noqa: A003
+class Command(SeedCommand):
+    help = 'Creates users for database, all sharing one password.'  # noqa: A003
 
     def add_arguments(self, parser):
-        parser.add_argument('quantity', type=int, choices=range(10, 1001))
+        super().add_arguments(parser)
+        parser.add_argument('--password', default='password', help='Password of every created user.')
 
     def handle(self, *args, **kwargs):
         quantity = kwargs['quantity']
-        users_list = []
-        for number in range(quantity):
-            users_list.append(User(first_name=fake.first_name(),
-                                   last_name=fake.last_name(),
-                                   username=fake.user_name(),
-                                   email=fake.email(),
-                                   password=make_password(fake.password())))
-        User.objects.bulk_create(users_list)
+        # Hashing is deliberately slow, so it's done once and the hash shared by all rows.
+        password = make_password(kwargs['password'])
+        start = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+        def prepare(rows):
+            for row in rows:
+                row['password'] = password
+
+        batches = generate(user_rows, quantity, kwargs['batch_size'], kwargs['workers'], kwargs['seed'], start)
+        insert(User, batches, prepare, self.progress('users', quantity), kwargs['batch_size'])
+        SiteCounter.increment(SiteCounter.USERS, quantity)
+        invalidate_all()
         self.stdout.write(f'{quantity} users have been created in database!')
@@ -0,0 +1,70 @@
+import re
+
+from blog import views
+from blog.models import Comment, Post, User
+from blog.pagination import KeysetPaginator
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+
+# PostgreSQL's sequential scans, SQLite's table scans not using an index and its temporary sort trees.
+FULL_SCAN = re.compile(r'Seq Scan|\bSCAN (?!.*\bUSING\b.*\bINDEX\b)|USE TEMP B-TREE')
+
+
+class Command(BaseCommand):
+    help = ("Prints EXPLAIN plans for the blog views' hot queries, after refreshing the planner "  # noqa: A003
+            'statistics. Without statistics, or on a few dozen rows, planners rightly prefer scanning small tables.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error if any plan falls back to a full scan or a sort.')
+
+    def view_queryset(self, view_class, user=None, **kwargs):
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        view = view_class()
+        view.setup(request, **kwargs)
+        return view.get_queryset()
+
+    def seek(self, queryset, per_page):
+        paginator = KeysetPaginator(queryset, per_page)
+        first = queryset.order_by(*paginator.ordering).first()
+        if first is None:
+            return queryset.order_by(*paginator.ordering)[:per_page + 1]
+        values, _ = paginator.decode_cursor(paginator.encode_cursor(first, 'next'))
+        return queryset.filter(paginator._seek(values, forward=True)).order_by(*paginator.ordering)[:per_page + 1]
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            for model in (Post, Comment, User):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+    def handle(self, *args, **kwargs):
+        self.analyze()
+        post = Post.objects.filter(is_published=True).select_related('author').first()
+        if post is None:
+            raise CommandError('No published posts to explain queries against.')
+
+        queries = {
+            'PostList': self.seek(self.view_queryset(views.PostList), views.PostList.paginate_by),
+            'MyPostsListView': self.seek(self.view_queryset(views.MyPostsListView, user=post.author),
+                                         views.MyPostsListView.paginate_by),
+            'CommentsList': self.seek(self.view_queryset(views.CommentsList, pk=post.pk),
+                                      views.CommentsList.paginate_by),
+            'PostDetails': Post.objects.select_related('author').filter(pk=post.pk),
+            'PostDetails last comments': Comment.objects.filter(post_id=post.pk, is_published=True).order_by(
+                '-pub_date', '-id')[:10],
+        }
+
+        regressions = []
+        for name, queryset in queries.items():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan + '\n')
+            if any(FULL_SCAN.search(line) for line in plan.splitlines()):
+                regressions.append(name)
+
+        if regressions and kwargs['fail_on_scan']:
+            raise CommandError(f'Full scan or sort in plan for: {", ".join(regressions)}')
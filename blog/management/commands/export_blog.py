@@ -0,0 +1,21 @@
+from blog.dumps import MODELS, export_model, open_dump
+from blog.seeding import BATCH_SIZE, positive_int
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Streams groups, users, posts and comments to a line-delimited JSON dump '  # noqa: A003
+            '(gzip compressed for *.gz).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Dump file, or '-' for stdout.")
+        parser.add_argument('--chunk-size', type=positive_int, default=BATCH_SIZE,
+                            help='Rows fetched from the database at a time.')
+
+    def handle(self, *args, **kwargs):
+        with open_dump(kwargs['path'], 'w') as dump:
+            for label in MODELS:
+                export_model(label, dump, kwargs['chunk_size'])
+        if kwargs['path'] != '-':
+            self.stdout.write(f'Exported {", ".join(MODELS)} to {kwargs["path"]}.')
@@ -0,0 +1,36 @@
+from blog import thumbnails
+from blog.cache import invalidate
+from blog.models import Post
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+
+class Command(BaseCommand):
+    help = 'Generates the missing image thumbnails, once per distinct image.'  # noqa: A003
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate the thumbnails of every image, overwriting the existing files.')
+
+    def handle(self, *args, **kwargs):
+        posts = Post.objects.exclude(image__in=['', Post.DEFAULT_IMAGE]).exclude(image__isnull=True)
+        images = posts.order_by().values_list('image', flat=True).distinct()
+        updated = 0
+        for name in images:
+            posts = Post.objects.filter(image=name)
+            if not kwargs['force']:
+                # A missing key compares as NULL, which exclude() alone would drop as well.
+                posts = posts.filter(~Q(thumbnails__has_key='source') | ~Q(thumbnails__source=name))
+            if not posts.exists():
+                continue
+            try:
+                derivatives = thumbnails.generate(Post(image=name).image, overwrite=kwargs['force'])
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'Skipped {name}: {exc}')
+                continue
+            updated += posts.update(thumbnails=derivatives)
+            self.stdout.write(f'{name}: {", ".join(derivatives["webp"])}')
+        if updated:
+            invalidate('feed')
+        self.stdout.write(f'Thumbnails set on {updated} posts.')
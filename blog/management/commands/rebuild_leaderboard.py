@@ -0,0 +1,37 @@
+from blog.cache import invalidate_all
+from blog.models import Comment, CommentActivity, LeaderboardEntry
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the top posts leaderboard from published comments.'  # noqa: A003
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        published = Comment.objects.filter(is_published=True).order_by()
+        hours = [hours for hours in LeaderboardEntry.windows().values() if hours is not None]
+
+        CommentActivity.objects.all().delete()
+        if hours:
+            since = timezone.now() - timezone.timedelta(hours=max(hours))
+            buckets = published.filter(pub_date__gte=since).annotate(hour=TruncHour('pub_date')).values(
+                'post_id', 'hour').annotate(total=Count('id'))
+            CommentActivity.objects.bulk_create([
+                CommentActivity(post_id=row['post_id'], hour=row['hour'], published=row['total']) for row in buckets
+            ], batch_size=1000)
+
+        LeaderboardEntry.objects.all().delete()
+        for window, window_hours in LeaderboardEntry.windows().items():
+            if window_hours is None:
+                totals = published.values('post_id').annotate(total=Count('id'))
+                LeaderboardEntry.objects.bulk_create([
+                    LeaderboardEntry(window=window, post_id=row['post_id'], score=row['total']) for row in totals
+                ], batch_size=1000)
+        LeaderboardEntry.refresh_windows()
+        invalidate_all()
+        self.stdout.write(f'Leaderboard rebuilt for {LeaderboardEntry.objects.count()} entries.')
@@ -0,0 +1,16 @@
+from blog.cache import invalidate_all
+from blog.search import get_backend
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index from published posts and comments.'  # noqa: A003
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        backend = get_backend()
+        backend.rebuild()
+        invalidate_all()
+        self.stdout.write(f'Search index rebuilt with {type(backend).__name__}.')
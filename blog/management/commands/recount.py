@@ -0,0 +1,26 @@
+from blog.cache import invalidate_all
+from blog.models import Comment, Post, SiteCounter, User
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+class Command(BaseCommand):
+    help = 'Recalculates the site counters and Post.comment_count from the tables.'  # noqa: A003
+
+    @transaction.atomic
+    def handle(self, *args, **kwargs):
+        counters = {
+            SiteCounter.USERS: User.objects.filter(is_staff=False, is_superuser=False).count(),
+            SiteCounter.POSTS: Post.objects.count(),
+            SiteCounter.COMMENTS: Comment.objects.count(),
+        }
+        for name, value in counters.items():
+            SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+
+        comments = Comment.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(total=Count('id'))
+        updated = Post.objects.update(comment_count=Coalesce(Subquery(comments.values('total')), Value(0)))
+        invalidate_all()
+        self.stdout.write(f'Counters: {counters}; comment counts refreshed for {updated} posts.')
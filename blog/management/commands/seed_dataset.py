@@ -0,0 +1,108 @@
+import random
+from array import array
+from datetime import datetime, timezone as dt_timezone
+
+from blog.cache import invalidate_all
+from blog.models import Comment, Post, SiteCounter, User
+from blog.seeding import (
+    SeedCommand, add_to_column, comment_rows, explicit_dates, generate, insert, positive_int, post_rows,
+    power_law_weights,
+)
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+
+def ratio(value):
+    number = float(value)
+    if not 0 <= number <= 1:
+        raise ValueError(value)
+    return number
+
+
+class Command(SeedCommand):
+    help = ('Seeds a production-shaped dataset: a few prolific authors, power-law comments per post, '  # noqa: A003
+            'drafts and unpublished comments, and timestamps spread over years.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=positive_int, default=1000)
+        parser.add_argument('--posts', type=positive_int, default=10000)
+        parser.add_argument('--comments', type=positive_int, default=100000)
+        parser.add_argument('--author-skew', type=float, default=1.1,
+                            help='Zipf exponent of posts per author, 0 spreads them evenly.')
+        parser.add_argument('--comment-skew', type=float, default=1.2,
+                            help='Zipf exponent of comments per published post, 0 spreads them evenly.')
+        parser.add_argument('--published', type=ratio, default=0.9, help='Share of published posts.')
+        parser.add_argument('--published-comments', type=ratio, default=0.85, help='Share of published comments.')
+        parser.add_argument('--years', type=float, default=3, help='Posts are spread over this many past years.')
+        parser.add_argument('--batch-size', type=positive_int, default=5000)
+        parser.add_argument('--workers', type=positive_int, default=1)
+        parser.add_argument('--seed', type=int, help='Same seed, same dataset (relative to the current time).')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Don't rebuild the leaderboard and the search index afterwards.")
+
+    def handle(self, *args, **kwargs):
+        seed = kwargs['seed'] if kwargs['seed'] is not None else random.randrange(2 ** 31)
+        self.stdout.write(f'Seed: {seed}')
+        batching = {'batch_size': kwargs['batch_size'], 'workers': kwargs['workers']}
+        now = timezone.now()
+        span = kwargs['years'] * 365.25 * 24 * 60 * 60
+
+        call_command('create_users', kwargs['users'], seed=seed, stdout=self.stdout, **batching)
+
+        rng = random.Random(seed)
+        author_ids = list(User.objects.filter(is_staff=False, is_superuser=False).order_by('id').values_list(
+            'id', flat=True))
+        # Which authors are the prolific ones is random too, not the oldest accounts.
+        rng.shuffle(author_ids)
+        author_weights = power_law_weights(len(author_ids), kwargs['author_skew'])
+
+        def prepare_posts(rows):
+            authors = rng.choices(author_ids, cum_weights=author_weights, k=len(rows))
+            for row, author_id in zip(rows, authors):
+                row['author_id'] = author_id
+                row['is_published'] = rng.random() < kwargs['published']
+                row['pub_date'] = now - timezone.timedelta(seconds=rng.random() * span)
+
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            insert(Post, generate(post_rows, kwargs['posts'], seed=seed + 1, **batching), prepare_posts,
+                   self.progress('posts', kwargs['posts']), kwargs['batch_size'])
+        SiteCounter.increment(SiteCounter.POSTS, kwargs['posts'])
+
+        # Compact arrays instead of (id, datetime) tuples keep a million posts in a few megabytes.
+        post_ids, posted = array('q'), array('d')
+        published = Post.objects.filter(is_published=True).order_by('id').values_list('id', 'pub_date')
+        for post_id, pub_date in published.iterator(chunk_size=kwargs['batch_size']):
+            post_ids.append(post_id)
+            posted.append(pub_date.timestamp())
+        if not post_ids:
+            raise CommandError('No published post to comment on, raise --published.')
+        # Popularity ranks are random, not by post age.
+        ranks = list(range(len(post_ids)))
+        rng.shuffle(ranks)
+        post_weights = power_law_weights(len(post_ids), kwargs['comment_skew'])
+        added = {}
+
+        def prepare_comments(rows):
+            for row, index in zip(rows, rng.choices(ranks, cum_weights=post_weights, k=len(rows))):
+                post_id = post_ids[index]
+                row['post_id'] = post_id
+                row['is_published'] = rng.random() < kwargs['published_comments']
+                # Most comments come shortly after the post, a long tail keeps trickling in.
+                seconds = posted[index] + (now.timestamp() - posted[index]) * rng.random() ** 4
+                row['pub_date'] = datetime.fromtimestamp(seconds, dt_timezone.utc)
+                added[post_id] = added.get(post_id, 0) + 1
+
+        with explicit_dates(Comment._meta.get_field('pub_date')):
+            insert(Comment, generate(comment_rows, kwargs['comments'], seed=seed + 2, **batching),
+                   prepare_comments, self.progress('comments', kwargs['comments']), kwargs['batch_size'])
+        SiteCounter.increment(SiteCounter.COMMENTS, kwargs['comments'])
+        add_to_column(Post, 'comment_count', added)
+
+        invalidate_all()
+        if not kwargs['skip_derived']:
+            call_command('rebuild_leaderboard', stdout=self.stdout)
+            call_command('rebuild_search_index', stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {kwargs["users"]} users, {kwargs["posts"]} posts and {kwargs["comments"]} comments.'))
@@ -0,0 +1,80 @@
+# Generated by Django 4.2 on 2026-10-18 15:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+
+def fill_leaderboard(apps, schema_editor):
+    Comment = apps.get_model('blog', 'Comment')
+    CommentActivity = apps.get_model('blog', 'CommentActivity')
+    LeaderboardEntry = apps.get_model('blog', 'LeaderboardEntry')
+    published = Comment.objects.filter(is_published=True).order_by()
+    windows = settings.BLOG_LEADERBOARD_WINDOWS
+    hours = [hours for hours in windows.values() if hours is not None]
+    if hours:
+        since = timezone.now() - timezone.timedelta(hours=max(hours))
+        buckets = published.filter(pub_date__gte=since).annotate(hour=TruncHour('pub_date')).values(
+            'post_id', 'hour').annotate(total=Count('id'))
+        CommentActivity.objects.bulk_create([
+            CommentActivity(post_id=row['post_id'], hour=row['hour'], published=row['total']) for row in buckets
+        ], batch_size=1000)
+
+    for window, window_hours in windows.items():
+        if window_hours is None:
+            totals = published.values('post_id').annotate(total=Count('id'))
+        else:
+            since = timezone.now() - timezone.timedelta(hours=window_hours)
+            totals = CommentActivity.objects.filter(hour__gte=since).values('post_id').annotate(
+                total=Sum('published'))
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(window=window, post_id=row['post_id'], score=row['total']) for row in totals
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0019_site_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=10)),
+                ('score', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CommentActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('published', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog.post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['window', '-score'], name='leaderboard_window_score_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardentry',
+            constraint=models.UniqueConstraint(fields=('window', 'post'), name='leaderboard_window_post_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='commentactivity',
+            index=models.Index(fields=['hour'], name='comment_activity_hour_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='commentactivity',
+            constraint=models.UniqueConstraint(fields=('post', 'hour'), name='comment_activity_post_hour_uniq'),
+        ),
+        migrations.RunPython(fill_leaderboard, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+POST_DOCUMENT = ("SELECT id * 2, 'post', id, id, heading, short_definition || ' ' || text "
+                 "FROM blog_post WHERE is_published")
+COMMENT_DOCUMENT = ("SELECT id * 2 + 1, 'comment', id, post_id, author, text "
+                    "FROM blog_comment WHERE is_published")
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE blog_search_fts USING fts5("
+    "kind UNINDEXED, object_id UNINDEXED, post_id UNINDEXED, title, body, tokenize = 'porter unicode61')",
+    f'INSERT INTO blog_search_fts (rowid, kind, object_id, post_id, title, body) {POST_DOCUMENT}',
+    f'INSERT INTO blog_search_fts (rowid, kind, object_id, post_id, title, body) {COMMENT_DOCUMENT}',
+]
+
+POSTGRESQL_CREATE = [
+    """
+    CREATE TABLE blog_search_document (
+        id bigint PRIMARY KEY,
+        kind varchar(10) NOT NULL,
+        object_id bigint NOT NULL,
+        post_id bigint NOT NULL,
+        title text NOT NULL,
+        body text NOT NULL,
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')
+        ) STORED
+    )
+    """,
+    'CREATE INDEX blog_search_document_idx ON blog_search_document USING GIN (document)',
+    f'INSERT INTO blog_search_document (id, kind, object_id, post_id, title, body) {POST_DOCUMENT}',
+    f'INSERT INTO blog_search_document (id, kind, object_id, post_id, title, body) {COMMENT_DOCUMENT}',
+]
+
+DROP = {
+    'sqlite': ['DROP TABLE IF EXISTS blog_search_fts'],
+    'postgresql': ['DROP TABLE IF EXISTS blog_search_document'],
+}
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0021_admin_notification'),
+    ]
+
+    operations = [
+        migrations.RunPython(run({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRESQL_CREATE}), run(DROP)),
+    ]
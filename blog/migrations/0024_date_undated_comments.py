@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-18 18:05
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def date_undated_comments(apps, schema_editor):
+    # Comments from before 0005 have no date. They are older than any dated comment of their thread,
+    # so they get the date of its earliest dated comment, or of the post when there is none.
+    Comment = apps.get_model('blog', 'Comment')
+    Post = apps.get_model('blog', 'Post')
+    earliest = Comment.objects.filter(post_id=OuterRef('post_id'), pub_date__isnull=False).order_by(
+        'pub_date').values('pub_date')[:1]
+    post_date = Post.objects.filter(pk=OuterRef('post_id')).values('pub_date')[:1]
+    Comment.objects.filter(pub_date__isnull=True).update(pub_date=Coalesce(Subquery(earliest), Subquery(post_date)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0023_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(date_undated_comments, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,75 @@
+from collections import Counter, defaultdict
+
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Case, F, Sum, Value, When
 from django.utils import timezone
 
-from django_lifecycle import AFTER_UPDATE, LifecycleModel, hook
+from django_lifecycle import AFTER_CREATE, AFTER_UPDATE, LifecycleModel, hook
 
-from .tasks import notification_for_author
+from . import search
+from .cache import invalidate
+from .tasks import (
+    DIGEST_QUEUED_KEY, DIGEST_QUEUED_TIMEOUT, notification_for_admin, notification_for_author,
+    notifications_for_authors, send_admin_digest,
+)
 
 
 User = get_user_model()
 
 
+class SiteCounter(models.Model):
+    USERS = 'users'
+    POSTS = 'posts'
+    COMMENTS = 'comments'
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+    @classmethod
+    def increment(cls, name, delta=1):
+        if not cls.objects.filter(name=name).update(value=F('value') + delta):
+            cls.objects.get_or_create(name=name)
+            cls.objects.filter(name=name).update(value=F('value') + delta)
+
+    @classmethod
+    def as_dict(cls):
+        counters = dict.fromkeys([cls.USERS, cls.POSTS, cls.COMMENTS], 0)
+        counters.update(cls.objects.values_list('name', 'value'))
+        return counters
+
+
+class AdminNotification(models.Model):
+    KINDS = (
+        ('post', 'Post'),
+        ('comment', 'Comment'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.PositiveBigIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'New {self.kind} {self.object_id}'
+
+    @classmethod
+    def notify(cls, kind, object_id):
+        if not settings.BLOG_ADMIN_DIGEST:
+            notification_for_admin.delay(notif=kind)
+            return
+        cls.objects.create(kind=kind, object_id=object_id)
+        if (cls.objects.count() >= settings.BLOG_ADMIN_DIGEST_THRESHOLD
+                and cache.add(DIGEST_QUEUED_KEY, True, DIGEST_QUEUED_TIMEOUT)):
+            transaction.on_commit(send_admin_digest.delay)
+
+
 class Post(models.Model):
+    DEFAULT_IMAGE = 'moon.png'
     BOOL = (
         (True, 'Publish'),
         (False, 'Draft'),
@@ -24,18 +82,34 @@ class Post(models.Model):
     image = models.ImageField(upload_to='images/',
                               blank=True,
                               null=True,
-                              default='moon.png',
+                              default=DEFAULT_IMAGE,
                               verbose_name='Load Image')
     is_published = models.BooleanField(choices=BOOL, verbose_name='Publish or Draft')
     pub_date = models.DateTimeField('date published', auto_now=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], condition=models.Q(is_published=True),
+                         name='post_published_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'], name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.heading
 
-    @hook(AFTER_UPDATE, when="is_published", has_changed=True)
-    def on_publish(self):
-        self.pub_date = timezone.datetime.now()
-        self.save()
+    @property
+    def has_default_image(self):
+        return not self.image or self.image.name == self.DEFAULT_IMAGE
+
+    def needs_thumbnails(self):
+        return not self.has_default_image and self.thumbnails.get('source') != self.image.name
+
+    def publish(self, is_published=True):
+        """Sets publication with a single UPDATE of is_published and pub_date (refreshed by auto_now)."""
+        self.is_published = is_published
+        self.save(update_fields=['is_published', 'pub_date'])
 
 
 class Comment(LifecycleModel):
@@ -43,11 +117,196 @@ class Comment(LifecycleModel):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     text = models.TextField(max_length=400)
     is_published = models.BooleanField(default=False)
-    pub_date = models.DateTimeField('date published', blank=True, null=True, auto_now=True)
+    pub_date = models.DateTimeField('date published', auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-pub_date', '-id'], condition=models.Q(is_published=True),
+                         name='comment_published_thread_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
+    @hook(AFTER_CREATE, when="is_published", is_now=True)
+    def on_create_published(self):
+        LeaderboardEntry.record(self.post_id, 1)
+
     @hook(AFTER_UPDATE, when="is_published", has_changed=True)
     def on_publish(self):
-        notification_for_author.delay(post_pk=self.post.id)
+        if self.is_published:
+            LeaderboardEntry.record(self.post_id, 1)
+        else:
+            # auto_now already moved pub_date, the comment was counted in the hour it was published.
+            LeaderboardEntry.record(self.post_id, -1, self.initial_value('pub_date'))
+        if self.is_published:
+            post_id = self.post_id
+            transaction.on_commit(lambda: Comment.notify_authors([post_id]))
+
+    @staticmethod
+    def notify_authors(post_ids, batched=False):
+        """
+        Queues one notification per post author, listing all of their posts that got new comments,
+        or a single task rendering and sending all of them when batched.
+        """
+        posts_by_email = defaultdict(list)
+        emails = Post.objects.filter(pk__in=set(post_ids)).exclude(author__email='').values_list('id', 'author__email')
+        for post_id, email in emails:
+            posts_by_email[email].append(post_id)
+        if batched:
+            if posts_by_email:
+                notifications_for_authors.delay([[email, sorted(post_pks)]
+                                                 for email, post_pks in posts_by_email.items()])
+            return
+        for email, post_pks in posts_by_email.items():
+            notification_for_author.delay(email=email, post_pks=sorted(post_pks))
+
+    @classmethod
+    @transaction.atomic
+    def set_published(cls, queryset, is_published):
+        """
+        Bulk version of toggling is_published and saving each comment: one UPDATE for all rows, then the
+        leaderboard, cache tags and author notifications the on_publish hook would have produced.
+        """
+        changed = list(queryset.exclude(is_published=is_published).values_list('id', 'post_id', 'pub_date'))
+        if not changed:
+            return 0
+        now = timezone.now()
+        changed_ids = [comment_id for comment_id, _, _ in changed]
+        cls.objects.filter(id__in=changed_ids).update(is_published=is_published, pub_date=now)
+
+        counts = Counter(post_id for _, post_id, _ in changed)
+        if is_published:
+            LeaderboardEntry.record_many(counts, now)
+        else:
+            # Unpublished comments leave the hour buckets they were published in.
+            LeaderboardEntry.record_activity(Counter(
+                (post_id, LeaderboardEntry.hour(pub_date)) for _, post_id, pub_date in changed), -1)
+        invalidate('comments', *[f'post:{post_id}' for post_id in counts])
+        search.sync_comments(cls.objects.filter(id__in=changed_ids))
+        if is_published:
+            transaction.on_commit(lambda: cls.notify_authors(list(counts), batched=True))
+        return len(changed)
+
+
+def per_post(values):
+    return Case(*[When(post_id=post_id, then=Value(value)) for post_id, value in values.items()],
+                default=Value(0), output_field=models.IntegerField())
+
+
+def add_to_rows(model, field, deltas, **lookup):
+    """Adds deltas[post_id] to field on the rows matching lookup and creates the missing rows."""
+    existing = set(model.objects.filter(post_id__in=deltas, **lookup).values_list('post_id', flat=True))
+    if existing:
+        increments = per_post({post_id: deltas[post_id] for post_id in existing})
+        model.objects.filter(post_id__in=existing, **lookup).update(**{field: F(field) + increments})
+    model.objects.bulk_create([model(post_id=post_id, **{field: delta}, **lookup)
+                               for post_id, delta in deltas.items() if post_id not in existing and delta > 0])
+
+
+class CommentActivity(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    hour = models.DateTimeField()
+    published = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'hour'], name='comment_activity_post_hour_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['hour'], name='comment_activity_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} @ {self.hour}: {self.published}'
+
+
+class LeaderboardEntry(models.Model):
+    window = models.CharField(max_length=10)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    score = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['window', 'post'], name='leaderboard_window_post_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['window', '-score'], name='leaderboard_window_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.window}: {self.post_id} ({self.score})'
+
+    @staticmethod
+    def windows():
+        return settings.BLOG_LEADERBOARD_WINDOWS
+
+    @classmethod
+    def top(cls, window='all', limit=5):
+        return cls.objects.filter(window=window, score__gt=0).order_by('-score').values(
+            'post_id', 'post__heading', 'score')[:limit]
+
+    @staticmethod
+    def hour(when):
+        return when.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def record(cls, post_id, delta, when=None):
+        cls.record_many({post_id: delta}, when)
+
+    @classmethod
+    def record_many(cls, deltas, when=None):
+        """Applies {post_id: delta} changes of comments published in the hour of when, now by default."""
+        hour = cls.hour(when or timezone.now())
+        cls.record_activity({(post_id, hour): delta for post_id, delta in deltas.items()})
+
+    @classmethod
+    @transaction.atomic
+    def record_activity(cls, changes, sign=1):
+        """
+        Applies {(post_id, hour): delta} changes of published comments, multiplied by sign, with one bucket
+        update per distinct hour and a fixed number of queries for the windows. Rows are only created for
+        positive deltas, so a removal never resurrects a deleted post.
+        """
+        by_hour = defaultdict(dict)
+        deltas = Counter()
+        for (post_id, hour), delta in changes.items():
+            if delta:
+                by_hour[hour][post_id] = sign * delta
+                deltas[post_id] += sign * delta
+        if not by_hour:
+            return
+        for hour, hour_deltas in by_hour.items():
+            add_to_rows(CommentActivity, 'published', hour_deltas, hour=hour)
+
+        for window, hours in cls.windows().items():
+            if hours is None:
+                add_to_rows(cls, 'score', {post_id: delta for post_id, delta in deltas.items() if delta},
+                            window=window)
+                continue
+            since = timezone.now() - timezone.timedelta(hours=hours)
+            scores = dict.fromkeys(deltas, 0)
+            scores.update(CommentActivity.objects.filter(post_id__in=deltas, hour__gte=since).values(
+                'post_id').annotate(total=Sum('published')).values_list('post_id', 'total'))
+            existing = set(cls.objects.filter(window=window, post_id__in=deltas).values_list('post_id', flat=True))
+            if existing:
+                cls.objects.filter(window=window, post_id__in=existing).update(score=per_post(
+                    {post_id: scores[post_id] for post_id in existing}))
+            cls.objects.bulk_create([cls(window=window, post_id=post_id, score=scores[post_id])
+                                     for post_id, delta in deltas.items() if post_id not in existing and delta > 0])
+
+    @classmethod
+    @transaction.atomic
+    def refresh_windows(cls):
+        """Recomputes the sliding windows so posts drop out once their comments age past the window."""
+        windows = {window: hours for window, hours in cls.windows().items() if hours is not None}
+        for window, hours in windows.items():
+            since = timezone.now() - timezone.timedelta(hours=hours)
+            scores = CommentActivity.objects.filter(hour__gte=since).values('post_id').annotate(
+                total=Sum('published')).filter(total__gt=0)
+            cls.objects.filter(window=window).delete()
+            cls.objects.bulk_create([cls(window=window, post_id=row['post_id'], score=row['total'])
+                                     for row in scores])
+        if windows:
+            oldest = timezone.now() - timezone.timedelta(hours=max(windows.values()))
+            CommentActivity.objects.filter(hour__lt=oldest).delete()
@@ -0,0 +1,140 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[-1], 'next')
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return self.paginator.encode_cursor(self.object_list[0], 'prev')
+        return None
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a unique ordering, e.g. ('-pub_date', '-id').
+    Every page is fetched with an indexed range filter and LIMIT, so the cost
+    doesn't grow with page depth the way OFFSET does.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-pub_date', '-id'), with_count=False, count_ttl=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.with_count = with_count
+        self.count_ttl = count_ttl
+
+    @property
+    def fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    @property
+    def count(self):
+        """Exact count when count_ttl is None, otherwise a count cached for count_ttl seconds."""
+        if self.count_ttl is None:
+            return self.queryset.count()
+        key = 'keyset-count:' + hashlib.md5(str(self.queryset.query).encode()).hexdigest()
+        return cache.get_or_set(key, self.queryset.count, self.count_ttl)
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for name, _ in self.fields:
+            value = getattr(obj, self.queryset.model._meta.get_field(name).attname)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            values, direction = payload['v'], payload['d']
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise ValueError
+            opts = self.queryset.model._meta
+            return [opts.get_field(name).to_python(value)
+                    for (name, _), value in zip(self.fields, values)], direction
+        except Exception as exc:
+            raise InvalidCursor(token) from exc
+
+    def _seek(self, values, forward):
+        condition = Q()
+        for index, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_index in range(index):
+                step &= Q(**{self.fields[prev_index][0]: values[prev_index]})
+            condition |= step
+        # A plain range bound on the leading column lets the planner seek the index.
+        name, descending = self.fields[0]
+        lookup = 'lte' if descending == forward else 'gte'
+        return Q(**{f'{name}__{lookup}': values[0]}) & condition
+
+    def page(self, cursor=None):
+        if not cursor:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, False)
+
+        values, direction = self.decode_cursor(cursor)
+        if direction == 'next':
+            qs = self.queryset.filter(self._seek(values, forward=True)).order_by(*self.ordering)
+            rows = list(qs[:self.per_page + 1])
+            return KeysetPage(rows[:self.per_page], self, len(rows) > self.per_page, True)
+
+        reverse = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+        qs = self.queryset.filter(self._seek(values, forward=False)).order_by(*reverse)
+        rows = list(qs[:self.per_page + 1])
+        return KeysetPage(rows[:self.per_page][::-1], self, True, len(rows) > self.per_page)
+
+
+class KeysetPaginationMixin:
+    """ListView mixin swapping OFFSET pagination for KeysetPaginator (?cursor=<token>)."""
+    cursor_kwarg = 'cursor'
+    keyset_ordering = ('-pub_date', '-id')
+    paginate_with_count = True
+    count_ttl = 60
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering,
+                                    self.paginate_with_count, self.count_ttl)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,155 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+logger = logging.getLogger('blog.performance')
+
+current_profile = ContextVar('blog_profile', default=None)
+
+# Statements kept in a slow request trace.
+TRACE_QUERIES = 5
+
+
+class RequestProfile:
+    """
+    Times one request: its queries through time_query(), its top level template renders through the
+    template backend below, and the events record() is called with. Only a traced request keeps the SQL
+    of its statements, every other one only adds up counts and durations.
+    """
+
+    def __init__(self, trace=False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+        self.events = {}
+        self.statements = [] if trace else None
+
+    def add_query(self, sql, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        if self.statements is not None:
+            self.statements.append((sql, elapsed))
+
+    def server_timing(self, total):
+        # Queries run while a template renders count as db, not tpl, so the parts add up to the total.
+        app = max(total - self.db_time - self.template_time, 0)
+        header = (f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries", '
+                  f'tpl;dur={self.template_time * 1000:.2f}, app;dur={app * 1000:.2f}, total;dur={total * 1000:.2f}')
+        if 'hits' in self.events:
+            return header + ', cache;desc="hit"'
+        if 'misses' in self.events:
+            return header + ', cache;desc="miss"'
+        return header
+
+    def trace(self, request, response, total):
+        slowest = sorted(self.statements, key=lambda statement: statement[1], reverse=True)[:TRACE_QUERIES]
+        repeated = Counter(sql for sql, _ in self.statements).most_common(TRACE_QUERIES)
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'user': request.user.id if hasattr(request, 'user') else None,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(self.db_time * 1000, 2),
+            'queries': self.queries,
+            'template_ms': round(self.template_time * 1000, 2),
+            'events': self.events,
+            'slowest_queries': [{'sql': sql, 'ms': round(elapsed * 1000, 2)} for sql, elapsed in slowest],
+            'repeated_queries': [{'sql': sql, 'count': count} for sql, count in repeated if count > 1],
+        }
+
+
+def time_query(execute, sql, params, many, context):
+    """Execute wrapper timing the queries of the request being profiled, a plain call outside requests."""
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - started)
+
+
+def install_query_timer(connection, **kwargs):
+    # Installed once per connection instead of with connection.execute_wrapper() on every request,
+    # looking up the thread's connections costs more than the rest of the profiling.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def record(event, delta=1):
+    """Counts an event, e.g. a view cache hit, on the profile of the current request if there is one."""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.events[event] = profile.events.get(event, 0) + delta
+
+
+class Template(django_backend.Template):
+
+    def render(self, context=None, request=None):
+        profile = current_profile.get()
+        # Included and nested templates are part of the outermost render.
+        if profile is None or profile.rendering:
+            return super().render(context, request)
+        profile.rendering = True
+        started, db_time = time.perf_counter(), profile.db_time
+        try:
+            return super().render(context, request)
+        finally:
+            profile.rendering = False
+            profile.template_time += time.perf_counter() - started - (profile.db_time - db_time)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The Django template backend, timing renders for PerformanceMiddleware."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class PerformanceMiddleware:
+    """
+    Adds a Server-Timing header with the request's database, template and remaining time, and logs a
+    trace of the sampled requests slower than BLOG_SLOW_REQUEST_MS to the blog.performance logger.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(install_query_timer, dispatch_uid='blog.profiling')
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        profile = RequestProfile(trace=random.random() < settings.BLOG_SLOW_REQUEST_SAMPLE_RATE)
+        token = current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        total = time.perf_counter() - profile.started
+
+        if settings.BLOG_SERVER_TIMING:
+            response.headers['Server-Timing'] = profile.server_timing(total)
+        if profile.statements is not None and total * 1000 >= settings.BLOG_SLOW_REQUEST_MS:
+            logger.warning(json.dumps(profile.trace(request, response, total)))
+        return response
@@ -0,0 +1,237 @@
+import abc
+import base64
+import json
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+# Highlight markers the database puts around matched terms, swapped for <mark> after escaping the text.
+START, STOP = '\x02', '\x03'
+
+POST_DOCUMENT = ("SELECT id * 2, 'post', id, id, heading, short_definition || ' ' || text "
+                 "FROM blog_post WHERE is_published")
+COMMENT_DOCUMENT = ("SELECT id * 2 + 1, 'comment', id, post_id, author, text "
+                    "FROM blog_comment WHERE is_published")
+
+
+class InvalidSearchCursor(Exception):
+    pass
+
+
+def highlight(text):
+    return mark_safe(escape(text or '').replace(START, '<mark>').replace(STOP, '</mark>'))
+
+
+def post_document_id(pk):
+    return pk * 2
+
+
+def comment_document_id(pk):
+    return pk * 2 + 1
+
+
+def post_document(post):
+    return post_document_id(post.pk), 'post', post.pk, post.pk, post.heading, f'{post.short_definition} {post.text}'
+
+
+def comment_document(comment):
+    return comment_document_id(comment.pk), 'comment', comment.pk, comment.post_id, comment.author, comment.text
+
+
+class SearchPage:
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class SearchBackend(abc.ABC):
+    """
+    An inverted index of the published posts and comments, one document per row keyed by
+    pk * 2 for posts and pk * 2 + 1 for comments. Results are ordered by score, then document id,
+    and paginated with a (score, id) cursor. Comments of unpublished posts are never returned.
+    """
+    # The index table, its document id column and its columns in the order of the documents.
+    table = None
+    id_column = None
+    columns = None
+
+    @abc.abstractmethod
+    def index(self, documents):
+        """Inserts or replaces (document id, kind, object id, post id, title, body) documents."""
+
+    def delete(self, document_ids):
+        if document_ids:
+            with connection.cursor() as cursor:
+                cursor.executemany(f'DELETE FROM {self.table} WHERE {self.id_column} = %s',
+                                   [(document_id,) for document_id in document_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            for select in (POST_DOCUMENT, COMMENT_DOCUMENT):
+                cursor.execute(f'INSERT INTO {self.table} ({self.columns}) {select}')
+
+    @abc.abstractmethod
+    def rows(self, query, after, limit):
+        """Returns (document id, kind, object id, post id, heading, title, snippet, score) rows."""
+
+    def search(self, query, cursor=None, per_page=10):
+        query = query.strip()
+        if not query:
+            return SearchPage([], None)
+        rows = self.rows(query, self.decode_cursor(cursor) if cursor else None, per_page + 1)
+        results = [{'kind': kind, 'object_id': object_id, 'post_id': post_id, 'heading': heading,
+                    'title': highlight(title), 'snippet': highlight(snippet), 'score': score}
+                   for _, kind, object_id, post_id, heading, title, snippet, score in rows[:per_page]]
+        next_cursor = None
+        if len(rows) > per_page:
+            last = rows[per_page - 1]
+            next_cursor = self.encode_cursor(last[-1], last[0])
+        return SearchPage(results, next_cursor)
+
+    def encode_cursor(self, score, document_id):
+        payload = json.dumps([score, document_id], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        try:
+            score, document_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+            return float(score), int(document_id)
+        except Exception as exc:
+            raise InvalidSearchCursor(token) from exc
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """FTS5 virtual table ranked with bm25(), negated so that a higher score is a better match."""
+    table = 'blog_search_fts'
+    id_column = 'rowid'
+    columns = 'rowid, kind, object_id, post_id, title, body'
+
+    @staticmethod
+    def match_expression(query):
+        # Every word is quoted, so user input can't produce FTS5 syntax errors, and all words must match.
+        return ' '.join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+    def index(self, documents):
+        if documents:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {self.table} ({self.columns}) VALUES (%s, %s, %s, %s, %s, %s)', documents)
+
+    def rows(self, query, after, limit):
+        seek, params = '', [START, STOP, START, STOP, self.match_expression(query)]
+        if after:
+            seek = 'WHERE score < %s OR (score = %s AND document_id > %s)'
+            params += [after[0], after[0], after[1]]
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT * FROM (
+                    SELECT f.rowid AS document_id, f.kind, f.object_id, f.post_id, p.heading,
+                           highlight(blog_search_fts, 3, %s, %s),
+                           snippet(blog_search_fts, 4, %s, %s, '…', 24),
+                           -bm25(blog_search_fts, 5.0, 1.0) AS score
+                    FROM blog_search_fts AS f
+                    JOIN blog_post AS p ON p.id = f.post_id AND p.is_published
+                    WHERE blog_search_fts MATCH %s
+                ) {seek}
+                ORDER BY score DESC, document_id
+                LIMIT {int(limit)}
+            """, params)
+            return cursor.fetchall()
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    """Table with a stored, weighted tsvector column under a GIN index, ranked with ts_rank()."""
+    table = 'blog_search_document'
+    id_column = 'id'
+    columns = 'id, kind, object_id, post_id, title, body'
+
+    def index(self, documents):
+        if documents:
+            with connection.cursor() as cursor:
+                cursor.executemany(f"""
+                    INSERT INTO {self.table} ({self.columns}) VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body
+                """, documents)
+
+    def rows(self, query, after, limit):
+        options = f'StartSel={START}, StopSel={STOP}'
+        params = [options + ', HighlightAll=true', options + ', MaxFragments=2', query]
+        seek = ''
+        if after:
+            seek = 'AND (ts_rank(d.document, q) < %s OR (ts_rank(d.document, q) = %s AND d.id > %s))'
+            params += [after[0], after[0], after[1]]
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT d.id, d.kind, d.object_id, d.post_id, p.heading,
+                       ts_headline('english', d.title, q, %s),
+                       ts_headline('english', d.body, q, %s),
+                       ts_rank(d.document, q) AS score
+                FROM blog_search_document AS d
+                JOIN blog_post AS p ON p.id = d.post_id AND p.is_published,
+                     websearch_to_tsquery('english', %s) AS q
+                WHERE d.document @@ q {seek}
+                ORDER BY score DESC, d.id
+                LIMIT {int(limit)}
+            """, params)
+            return [(*row[:-1], float(row[-1])) for row in cursor.fetchall()]
+
+
+class NullSearchBackend(SearchBackend):
+    """For databases without a supported full-text index, nothing is indexed and nothing is found."""
+
+    def index(self, documents):
+        pass
+
+    def delete(self, document_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def rows(self, query, after, limit):
+        return []
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """BLOG_SEARCH_BACKEND may name a backend class, otherwise it's picked by the database vendor."""
+    path = getattr(settings, 'BLOG_SEARCH_BACKEND', None)
+    backend_class = import_string(path) if path else BACKENDS.get(connection.vendor, NullSearchBackend)
+    return backend_class()
+
+
+def sync_post(post):
+    if post.is_published:
+        deferred = post.get_deferred_fields() & {'heading', 'short_definition', 'text'}
+        if deferred:
+            post.refresh_from_db(fields=deferred)
+        get_backend().index([post_document(post)])
+    else:
+        get_backend().delete([post_document_id(post.pk)])
+
+
+def sync_comments(comments):
+    backend = get_backend()
+    backend.index([comment_document(comment) for comment in comments if comment.is_published])
+    backend.delete([comment_document_id(comment.pk) for comment in comments if not comment.is_published])
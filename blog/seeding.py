@@ -0,0 +1,153 @@
+import argparse
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from faker import Faker
+
+BATCH_SIZE = 5000
+# Keeps the number of ids in one IN (...) under SQLite's bound parameters limit.
+IDS_PER_QUERY = 900
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not a positive number')
+    return number
+
+
+def faker(seed):
+    fake = Faker()
+    fake.seed_instance(seed)
+    return fake
+
+
+# Row factories run in the worker processes: they only build Faker values, the foreign keys
+# and anything else needing the database are filled in by the parent process.
+
+def user_rows(start, count, seed):
+    fake = faker(seed)
+    rows = []
+    for number in range(start, start + count):
+        # Faker usernames repeat after a few thousand, the row number keeps them unique.
+        username = f'{fake.user_name()}-{number}'
+        rows.append({'first_name': fake.first_name(), 'last_name': fake.last_name(), 'username': username,
+                     'email': f'{username}@{fake.free_email_domain()}'})
+    return rows
+
+
+def post_rows(start, count, seed):
+    fake = faker(seed)
+    return [{'heading': fake.sentence(nb_words=5)[:50], 'text': fake.text(),
+             'short_definition': fake.paragraph(nb_sentences=3)[:200]}
+            for _ in range(count)]
+
+
+def comment_rows(start, count, seed):
+    fake = faker(seed)
+    # user_name() is the slowest provider by far, commenters are drawn from a smaller pool instead.
+    authors = [fake.user_name() for _ in range(min(count, 200))]
+    return [{'author': fake.random.choice(authors), 'text': fake.paragraph(nb_sentences=5)[:400]}
+            for _ in range(count)]
+
+
+def jobs(total, batch_size, seed=None, start=0):
+    for index, offset in enumerate(range(0, total, batch_size)):
+        yield start + offset, min(batch_size, total - offset), None if seed is None else seed + index
+
+
+def generate(factory, total, batch_size=BATCH_SIZE, workers=1, seed=None, start=0):
+    """
+    Yields the rows of factory batch_size at a time, in order. With several workers, batches are generated
+    in a process pool with at most two per worker in flight, so memory doesn't grow with the total.
+    """
+    if workers <= 1:
+        for job in jobs(total, batch_size, seed, start):
+            yield factory(*job)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = []
+        for job in jobs(total, batch_size, seed, start):
+            pending.append(pool.submit(factory, *job))
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def insert(model, batches, prepare=None, progress=None, batch_size=BATCH_SIZE):
+    """
+    bulk_create()s every batch of rows in its own transaction, so nothing but the current batch is held
+    in memory, and returns the number of rows created.
+    """
+    created = 0
+    for rows in batches:
+        if prepare is not None:
+            prepare(rows)
+        model.objects.bulk_create([model(**row) for row in rows], batch_size=batch_size)
+        created += len(rows)
+        if progress is not None:
+            progress(created)
+    return created
+
+
+def assign(rows, field, ids, rng, cum_weights=None):
+    for row, value in zip(rows, rng.choices(ids, cum_weights=cum_weights, k=len(rows))):
+        row[field] = value
+
+
+def power_law_weights(count, exponent):
+    """Cumulative Zipf weights for random.choices(): the item of rank r is drawn in proportion to 1 / r ** exponent."""
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Lets bulk_create() store the given values of auto_now fields instead of the current time."""
+    saved = [(field, field.auto_now) for field in fields]
+    for field in fields:
+        field.auto_now = False
+    try:
+        yield
+    finally:
+        for field, auto_now in saved:
+            field.auto_now = auto_now
+
+
+def add_to_column(model, field, deltas):
+    """Adds {pk: delta} to field with one UPDATE per distinct delta and chunk of ids."""
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        for offset in range(0, len(pks), IDS_PER_QUERY):
+            model.objects.filter(pk__in=pks[offset:offset + IDS_PER_QUERY]).update(**{field: F(field) + delta})
+
+
+class SeedCommand(BaseCommand):
+    """Options and progress output shared by the seeding commands."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('quantity', type=positive_int)
+        parser.add_argument('--batch-size', type=positive_int, default=BATCH_SIZE,
+                            help='Rows generated and inserted per batch.')
+        parser.add_argument('--workers', type=positive_int, default=1,
+                            help='Processes generating the fake data in parallel.')
+        parser.add_argument('--seed', type=int, help='Makes the generated data reproducible.')
+
+    def progress(self, label, total):
+        started = time.monotonic()
+
+        def report(done):
+            rate = done / max(time.monotonic() - started, 1e-9)
+            self.stdout.write(f'{label}: {done}/{total} ({done * 100 // total}%, {rate:,.0f} rows/s)',
+                              ending='\n' if done >= total else '\r')
+            self.stdout.flush()
+        return report
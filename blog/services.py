@@ -0,0 +1,28 @@
+from .models import AdminNotification, Comment
+
+
+def register_user(form):
+    return form.save()
+
+
+def create_post(form, author):
+    form.instance.author = author
+    post = form.save()
+    AdminNotification.notify('post', post.pk)
+    return post
+
+
+def update_post(form):
+    """Writes only the columns the form changed; a bare publish toggle goes through Post.publish."""
+    post = form.instance
+    if form.changed_data == ['is_published']:
+        post.publish(form.cleaned_data['is_published'])
+    elif form.changed_data:
+        post.save(update_fields=[*form.changed_data, 'pub_date'])
+    return post
+
+
+def add_comment(post, author, text):
+    comment = Comment.objects.create(post=post, author=author, text=text)
+    AdminNotification.notify('comment', comment.pk)
+    return comment
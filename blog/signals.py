@@ -0,0 +1,109 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .cache import invalidate
+from .models import Comment, LeaderboardEntry, Post, SiteCounter, User
+from .tasks import generate_thumbnails
+
+
+def is_site_user(user):
+    return not (user.is_staff or user.is_superuser)
+
+
+@receiver(post_save, sender=User)
+def count_created_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and is_site_user(instance):
+        SiteCounter.increment(SiteCounter.USERS)
+
+
+@receiver(post_delete, sender=User)
+def count_deleted_user(sender, instance, **kwargs):
+    if is_site_user(instance):
+        SiteCounter.increment(SiteCounter.USERS, -1)
+
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        invalidate('users')
+    elif update_fields is None or set(update_fields) != {'last_login'}:
+        # Usernames are shown on the post cards, the login timestamp isn't.
+        invalidate('feed')
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    invalidate('users', 'feed')
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        SiteCounter.increment(SiteCounter.POSTS)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    SiteCounter.increment(SiteCounter.POSTS, -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    invalidate('feed', f'post:{instance.pk}', f'author:{instance.author_id}')
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, created, update_fields=None, **kwargs):
+    if created and not instance.is_published:
+        return
+    if update_fields is None or set(update_fields) & {'heading', 'short_definition', 'text', 'is_published'}:
+        search.sync_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def thumbnail_post_image(sender, instance, update_fields=None, **kwargs):
+    if (update_fields is None or 'image' in update_fields) and instance.needs_thumbnails():
+        post_id = instance.pk
+        transaction.on_commit(lambda: generate_thumbnails.delay(post_id))
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().delete([search.post_document_id(instance.pk)])
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        SiteCounter.increment(SiteCounter.COMMENTS)
+        Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    SiteCounter.increment(SiteCounter.COMMENTS, -1)
+    Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') - 1)
+    if instance.is_published:
+        LeaderboardEntry.record(instance.post_id, -1, instance.pub_date)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    invalidate('comments', f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, **kwargs):
+    # A new draft comment has nothing in the index to remove yet.
+    if instance.is_published or not created:
+        search.sync_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.get_backend().delete([search.comment_document_id(instance.pk)])
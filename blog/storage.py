@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def plain_storages():
+    """STORAGES serving static files under their plain names, for runs without DEBUG and without collectstatic."""
+    return {**settings.STORAGES, 'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
@@ -1,7 +1,21 @@
+from collections import Counter
+
 from celery import shared_task
 
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.urls import reverse
+
+from . import thumbnails
+from .cache import invalidate
+from .mail import render_email, render_many, send_mail, send_messages
+
+# Held while a threshold flush is queued, so notifications past the threshold don't each queue another one.
+DIGEST_QUEUED_KEY = 'admin-digest-queued'
+DIGEST_QUEUED_TIMEOUT = 60
 
 
 @shared_task
@@ -12,7 +26,6 @@ def send_feedback_to_admin(author, title, text, score, reply):
         {text}''',
         'user@example.com',
         ['admin@example.com'],
-        fail_silently=False,
     )
 
 
@@ -23,17 +36,70 @@ def notification_for_admin(notif):
         'Check your admin page',
         'from@example.com',
         ['admin@example.com'],
-        fail_silently=False,
     )
 
 
+def comments_notification(email, html_message):
+    message = EmailMultiAlternatives("Hi, it's MyBlog", "New comments were published on your posts!",
+                                     'from@example.com', [email])
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
 @shared_task
-def notification_for_author(post_pk):
-    send_mail(
-        "Hi, it's MyBlog",
-        "New comment was published!",
-        'from@example.com',
-        ['admin@example.com'],
-        fail_silently=False,
-        html_message=render_to_string('blog/email_for_user.html', {'post_pk': post_pk})
-    )
+def notification_for_author(email, post_pks):
+    html_message = render_email('blog/email_for_user.html', {'post_pks': post_pks, 'site_url': settings.BLOG_SITE_URL})
+    send_messages([comments_notification(email, html_message)])
+
+
+@shared_task
+def notifications_for_authors(recipients):
+    """Takes [email, post_pks] pairs and renders all the messages in one pass."""
+    contexts = [{'post_pks': post_pks, 'site_url': settings.BLOG_SITE_URL} for _, post_pks in recipients]
+    html_messages = render_many('blog/email_for_user.html', contexts)
+    send_messages([comments_notification(email, html_message)
+                   for (email, _), html_message in zip(recipients, html_messages)])
+
+
+@shared_task
+def refresh_leaderboard():
+    apps.get_model('blog', 'LeaderboardEntry').refresh_windows()
+    invalidate('comments')
+
+
+@shared_task
+def send_admin_digest():
+    cache.delete(DIGEST_QUEUED_KEY)
+    notifications = apps.get_model('blog', 'AdminNotification').objects
+    with transaction.atomic():
+        # Rows claimed by a concurrent digest are skipped, each notification is mailed by one worker only.
+        pending = list(notifications.select_for_update(skip_locked=True).order_by('id'))
+        if not pending:
+            return
+        notifications.filter(id__in=[item.id for item in pending]).delete()
+
+        counts = Counter(item.kind for item in pending)
+        summary = ', '.join(f'new {kind}s: {count}' for kind, count in sorted(counts.items()))
+        links = '\n'.join(
+            f'{settings.BLOG_SITE_URL}{reverse(f"admin:blog_{item.kind}_change", args=[item.object_id])}'
+            for item in pending
+        )
+        # Sent before the commit: if sending fails, the rows are back for the next digest.
+        send_mail(
+            f'MyBlog digest: {summary}',
+            f'Since the last digest: {summary}.\n\n{links}',
+            'from@example.com',
+            ['admin@example.com'],
+        )
+
+
+@shared_task
+def generate_thumbnails(post_id):
+    Post = apps.get_model('blog', 'Post')
+    post = Post.objects.filter(pk=post_id).only('id', 'author_id', 'image', 'thumbnails').first()
+    if post is None or not post.needs_thumbnails():
+        return
+    derivatives = thumbnails.generate(post.image)
+    # The image may have been replaced while this task ran, its own task will take care of it then.
+    if Post.objects.filter(pk=post_id, image=post.image.name).update(thumbnails=derivatives):
+        invalidate('feed', f'post:{post_id}', f'author:{post.author_id}')
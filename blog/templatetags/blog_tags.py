@@ -0,0 +1,27 @@
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import default_storage
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.filter
+def authored_by(post, user):
+    return post.author_id == user.id
+
+
+@register.inclusion_tag('blog/post_picture.html')
+def post_picture(post, size, css_class='', sizes='200px'):
+    """The post image as a <picture> with WebP and JPEG srcsets, or the original upload until they're generated."""
+    if post.has_default_image:
+        derivatives, url = thumbnails.default_thumbnails(), staticfiles_storage.url
+    else:
+        derivatives, url = post.thumbnails or {}, default_storage.url
+    context = {'post': post, 'css_class': css_class, 'sizes': sizes}
+    if size in derivatives.get('jpeg', {}):
+        context.update(src=thumbnails.src(derivatives, size, url=url),
+                       webp_srcset=thumbnails.srcset(derivatives, 'webp', url=url),
+                       jpeg_srcset=thumbnails.srcset(derivatives, 'jpeg', url=url))
+    return context
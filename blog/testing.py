@@ -0,0 +1,17 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .storage import plain_storages
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the tests, which run without DEBUG, against static files that were never collected."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.storages = override_settings(STORAGES=plain_storages())
+        self.storages.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.storages.disable()
+        super().teardown_test_environment(**kwargs)
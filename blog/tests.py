@@ -1,3 +1,1059 @@
-from django.test import TestCase   # noqa: F401
+import io
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.template import Context, Template
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import benchmarks, mail as mail_pool, thumbnails, urls
+from .cache import invalidate, tag_versions
+from .dumps import open_dump
+from .models import AdminNotification, Comment, CommentActivity, LeaderboardEntry, Post, SiteCounter, User
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import get_backend
+from .tasks import generate_thumbnails, notifications_for_authors, send_admin_digest
+
+
+class PostDetailsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='secret')
+        cls.post = Post.objects.create(author=cls.author, heading='Heading', text='Text',
+                                       short_definition='Short', is_published=True)
+        Comment.objects.bulk_create([
+            Comment(author=f'reader{number}', post=cls.post, text=f'Comment {number}', is_published=True)
+            for number in range(15)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_get_fetches_post_once(self):
+        url = reverse('blog:post_details', kwargs={'pk': self.post.pk})
+        # The post with its author, then the last comments.
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['comments_page']), 10)
+
+        # The comment thread fragment is cached until a comment on the post changes.
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_comments_feed_continues_embedded_thread(self):
+        response = self.client.get(reverse('blog:post_details', kwargs={'pk': self.post.pk}))
+        embedded = [comment.text for comment in response.context['comments_page']]
+        feed = self.client.get(reverse('blog:comments_feed', kwargs={'pk': self.post.pk}),
+                               {'cursor': response.context['comments_page'].next_cursor}).json()
+        texts = embedded + [comment['text'] for comment in feed['comments']]
+        self.assertEqual(sorted(texts), sorted(f'Comment {number}' for number in range(15)))
+        self.assertIsNone(feed['next_cursor'])
+
+    def test_missing_post_redirects(self):
+        response = self.client.get(reverse('blog:post_details', kwargs={'pk': self.post.pk + 1}))
+        self.assertRedirects(response, reverse('blog:index'), fetch_redirect_response=False)
+
+    def test_draft_post_redirects(self):
+        Post.objects.filter(pk=self.post.pk).update(is_published=False)
+        response = self.client.get(reverse('blog:post_details', kwargs={'pk': self.post.pk}))
+        self.assertRedirects(response, reverse('blog:index'), fetch_redirect_response=False)
+
+    @mock.patch('blog.models.notification_for_admin.delay')
+    def test_comment_post_fetches_post_once(self, delay):
+        url = reverse('blog:post_details', kwargs={'pk': self.post.pk})
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, {'author': 'reader', 'text': 'New comment'})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        post_selects = [query for query in context.captured_queries if query['sql'].startswith('SELECT "blog_post"')]
+        self.assertEqual(len(post_selects), 1)
+        self.assertTrue(Comment.objects.filter(post=self.post, text='New comment', is_published=False).exists())
+        self.assertTrue(AdminNotification.objects.filter(kind='comment').exists())
+        delay.assert_not_called()
+
+    @mock.patch('blog.models.notification_for_admin.delay')
+    def test_invalid_comment_renders_details(self, delay):
+        url = reverse('blog:post_details', kwargs={'pk': self.post.pk})
+        response = self.client.post(url, {'author': 'reader'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['post'], self.post)
+        self.assertTrue(response.context['form'].errors)
+        delay.assert_not_called()
+
+
+class AdminDigestTests(TestCase):
+
+    def test_digest_sends_one_mail_for_pending_notifications(self):
+        for number in range(3):
+            AdminNotification.notify('comment', number + 1)
+        AdminNotification.notify('post', 1)
+
+        send_admin_digest()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('new comments: 3', mail.outbox[0].subject)
+        self.assertIn('new posts: 1', mail.outbox[0].subject)
+        self.assertIn('/admin/blog/comment/2/change/', mail.outbox[0].body)
+        self.assertFalse(AdminNotification.objects.exists())
+
+        send_admin_digest()
+        self.assertEqual(len(mail.outbox), 1)
+
+    @override_settings(BLOG_ADMIN_DIGEST_THRESHOLD=2)
+    @mock.patch('blog.models.send_admin_digest.delay')
+    def test_threshold_flushes_early(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            AdminNotification.notify('post', 1)
+        delay.assert_not_called()
+        with self.captureOnCommitCallbacks(execute=True):
+            AdminNotification.notify('post', 2)
+        delay.assert_called_once_with()
+
+    @override_settings(BLOG_ADMIN_DIGEST_THRESHOLD=2)
+    @mock.patch('blog.models.send_admin_digest.delay')
+    def test_threshold_queues_one_flush_until_it_runs(self, delay):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(5):
+                AdminNotification.notify('post', number)
+        delay.assert_called_once_with()
+
+        send_admin_digest()
+        with self.captureOnCommitCallbacks(execute=True):
+            AdminNotification.notify('post', 6)
+            AdminNotification.notify('post', 7)
+        self.assertEqual(delay.call_count, 2)
+
+    def test_failed_digest_keeps_notifications(self):
+        AdminNotification.notify('post', 1)
+        with mock.patch('blog.tasks.send_mail', side_effect=OSError), self.assertRaises(OSError):
+            send_admin_digest()
+        self.assertEqual(AdminNotification.objects.count(), 1)
+
+    @override_settings(BLOG_ADMIN_DIGEST=False)
+    @mock.patch('blog.models.notification_for_admin.delay')
+    def test_digest_disabled_sends_immediately(self, delay):
+        AdminNotification.notify('post', 1)
+        delay.assert_called_once_with(notif='post')
+        self.assertFalse(AdminNotification.objects.exists())
+
+
+class AuthorNotificationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create_user(username='first', email='first@example.com')
+        cls.second = User.objects.create_user(username='second', email='second@example.com')
+        cls.posts = [Post.objects.create(author=author, text='Text', short_definition='Short', is_published=True)
+                     for author in (cls.first, cls.first, cls.second)]
+
+    @mock.patch('blog.models.notification_for_author.delay')
+    def test_fan_out_queues_one_task_per_author(self, delay):
+        post_ids = [self.posts[0].pk, self.posts[1].pk, self.posts[1].pk, self.posts[2].pk]
+        with self.assertNumQueries(1):
+            Comment.notify_authors(post_ids)
+        self.assertCountEqual(delay.call_args_list, [
+            mock.call(email='first@example.com', post_pks=sorted([self.posts[0].pk, self.posts[1].pk])),
+            mock.call(email='second@example.com', post_pks=[self.posts[2].pk]),
+        ])
+
+    @mock.patch('blog.models.notification_for_author.delay')
+    def test_publishing_a_comment_notifies_its_post_author(self, delay):
+        comment = Comment.objects.create(author='reader', post=self.posts[2], text='Text')
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.is_published = True
+            comment.save()
+        delay.assert_called_once_with(email='second@example.com', post_pks=[self.posts[2].pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.is_published = False
+            comment.save()
+        delay.assert_called_once()
+
+    def test_bulk_notifications_render_one_message_per_author(self):
+        notifications_for_authors([['first@example.com', [3, 5]], ['second@example.com', [7]]])
+        self.assertEqual([message.to for message in mail.outbox], [['first@example.com'], ['second@example.com']])
+        html = [message.alternatives[0][0] for message in mail.outbox]
+        self.assertIn(reverse('blog:post_details', kwargs={'pk': 3}), html[0])
+        self.assertIn(reverse('blog:post_details', kwargs={'pk': 5}), html[0])
+        self.assertIn(reverse('blog:post_details', kwargs={'pk': 7}), html[1])
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend')
+class MailPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        mail_pool.close_pooled_connection()
+        self.addCleanup(mail_pool.close_pooled_connection)
+        patcher = mock.patch('smtplib.SMTP')
+        self.smtp = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.smtp.return_value.noop.return_value = (250, b'OK')
+
+    def messages(self, count):
+        return [EmailMessage('Subject', 'Body', 'blog@example.com', [f'reader{number}@example.com'])
+                for number in range(count)]
+
+    def recipients(self):
+        return [call.args[1] for call in self.smtp.return_value.sendmail.call_args_list]
+
+    def test_one_connection_is_reused_across_sends(self):
+        self.assertEqual(mail_pool.send_messages(self.messages(2)), 2)
+        self.assertEqual(mail_pool.send_messages(self.messages(1)), 1)
+        self.smtp.assert_called_once()
+        self.assertEqual(self.smtp.return_value.sendmail.call_count, 3)
+        self.smtp.return_value.noop.assert_not_called()
+
+    def test_idle_connection_is_checked_with_noop(self):
+        mail_pool.send_messages(self.messages(1))
+        mail_pool._pool.last_used -= mail_pool.HEALTHCHECK_AFTER + 1
+        mail_pool.send_messages(self.messages(1))
+        self.smtp.return_value.noop.assert_called_once()
+        self.smtp.assert_called_once()
+
+        mail_pool._pool.last_used -= mail_pool.HEALTHCHECK_AFTER + 1
+        self.smtp.return_value.noop.side_effect = smtplib.SMTPServerDisconnected
+        mail_pool.send_messages(self.messages(1))
+        self.assertEqual(self.smtp.call_count, 2)
+
+    def test_disconnect_retries_only_the_unsent_message(self):
+        self.smtp.return_value.sendmail.side_effect = [None, smtplib.SMTPServerDisconnected, None, None]
+        self.assertEqual(mail_pool.send_messages(self.messages(3)), 3)
+        self.assertEqual(self.smtp.call_count, 2)
+        self.assertEqual(self.recipients(), [['reader0@example.com'], ['reader1@example.com'],
+                                             ['reader1@example.com'], ['reader2@example.com']])
+
+    def test_connection_is_reopened_when_the_backend_changes(self):
+        mail_pool.send_messages(self.messages(1))
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            mail_pool.send_messages(self.messages(1))
+        self.smtp.return_value.quit.assert_called_once()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(self.smtp.return_value.sendmail.call_count, 1)
+
+
+class CommentModerationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+        cls.posts = [Post.objects.create(author=cls.author, text='Text', short_definition='Short', is_published=True)
+                     for _ in range(10)]
+
+    def create_comments(self, quantity):
+        return Comment.objects.bulk_create([
+            Comment(author='reader', post=self.posts[number % len(self.posts)], text='Text')
+            for number in range(quantity)
+        ])
+
+    def publish_queries(self, quantity):
+        comments = self.create_comments(quantity)
+        with CaptureQueriesContext(connection) as context:
+            Comment.set_published(Comment.objects.filter(pk__in=[comment.pk for comment in comments]), True)
+        return len(context)
+
+    @mock.patch('blog.models.notifications_for_authors.delay')
+    def test_query_count_does_not_depend_on_comment_count(self, delay):
+        # Once every post has leaderboard rows, publishing only updates them.
+        self.publish_queries(len(self.posts))
+        self.assertEqual(self.publish_queries(3), self.publish_queries(30))
+
+    @mock.patch('blog.models.notifications_for_authors.delay')
+    def test_bulk_publish_matches_per_row_publish(self, delay):
+        comments = self.create_comments(15)
+        with self.captureOnCommitCallbacks(execute=True):
+            published = Comment.set_published(Comment.objects.all(), True)
+        self.assertEqual(published, 15)
+        self.assertFalse(Comment.objects.filter(is_published=False).exists())
+        for window in LeaderboardEntry.windows():
+            scores = dict(LeaderboardEntry.objects.filter(window=window).values_list('post_id', 'score'))
+            self.assertEqual(scores[self.posts[0].pk], 2)
+            self.assertEqual(scores[self.posts[9].pk], 1)
+        delay.assert_called_once_with([['author@example.com', sorted(post.pk for post in self.posts)]])
+
+        self.assertEqual(Comment.set_published(Comment.objects.filter(pk=comments[0].pk), False), 1)
+        self.assertEqual(LeaderboardEntry.objects.get(window='all', post=self.posts[0]).score, 1)
+        self.assertEqual(Comment.set_published(Comment.objects.filter(pk=comments[0].pk), False), 0)
+
+
+class CounterTests(TestCase):
+
+    @mock.patch('blog.models.notification_for_admin.delay')
+    def test_signals_keep_the_counters(self, delay):
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, text='Text', short_definition='Short', is_published=True)
+        comments = [Comment.objects.create(author='reader', post=post, text='Comment') for _ in range(3)]
+        self.assertEqual(SiteCounter.as_dict(), {'users': 1, 'posts': 1, 'comments': 3})
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 3)
+
+        comments[0].delete()
+        staff.delete()
+        self.assertEqual(SiteCounter.as_dict(), {'users': 1, 'posts': 1, 'comments': 2})
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+
+        author.delete()
+        self.assertEqual(SiteCounter.as_dict(), {'users': 0, 'posts': 0, 'comments': 0})
+
+    def test_recount_repairs_drift(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, text='Text', short_definition='Short', is_published=True)
+        Comment.objects.bulk_create([Comment(author='reader', post=post, text='Comment') for _ in range(4)])
+        SiteCounter.objects.all().delete()
+        call_command('recount', stdout=io.StringIO())
+        self.assertEqual(SiteCounter.as_dict(), {'users': 1, 'posts': 1, 'comments': 4})
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 4)
+
+
+class KeysetPaginatorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create([Post(author=author, heading=f'Post {number}', text='Text', short_definition='Short',
+                                       is_published=True) for number in range(23)])
+        # Ties on pub_date are broken by id.
+        Post.objects.filter(id__lte=10).update(pub_date=timezone.now() - timezone.timedelta(days=1))
+        cls.queryset = Post.objects.filter(is_published=True)
+        cls.ordered = list(cls.queryset.order_by('-pub_date', '-id').values_list('id', flat=True))
+
+    def test_cursors_walk_every_row_once_in_both_directions(self):
+        paginator = KeysetPaginator(self.queryset, 5)
+        pages, page = [], paginator.page()
+        self.assertFalse(page.has_previous())
+        while True:
+            pages.append([post.id for post in page])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual([post_id for ids in pages for post_id in ids], self.ordered)
+        self.assertEqual([len(ids) for ids in pages], [5, 5, 5, 5, 3])
+
+        for ids in reversed(pages[:-1]):
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual([post.id for post in page], ids)
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_next())
+
+    def test_invalid_cursors(self):
+        paginator = KeysetPaginator(self.queryset, 5)
+        for cursor in ('garbage', 'eyJ2IjpbXSwiZCI6Im5leHQifQ', paginator.page().next_cursor[:-3] + 'xyz'):
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                paginator.page(cursor)
+        self.assertEqual(self.client.get(reverse('blog:posts_list'), {'cursor': 'garbage'}).status_code, 404)
+
+
+class UndatedCommentsMigrationTests(TransactionTestCase):
+    before, after = ('blog', '0023_post_thumbnails'), ('blog', '0025_alter_comment_pub_date')
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([target])
+        return executor.loader.project_state([target]).apps
+
+    def test_undated_comments_are_dated_and_paginated(self):
+        apps = self.migrate(self.before)
+        self.addCleanup(self.migrate, self.after)
+        author = apps.get_model('auth', 'User').objects.create(username='author')
+        post = apps.get_model('blog', 'Post').objects.create(author_id=author.pk, text='Text',
+                                                             short_definition='Short', is_published=True)
+        Comment = apps.get_model('blog', 'Comment')
+        Comment.objects.bulk_create([Comment(author='reader', post_id=post.pk, text='Comment', is_published=True)
+                                     for _ in range(25)])
+        dated = Comment.objects.order_by('id')[12]
+        Comment.objects.exclude(pk=dated.pk).filter(id__lt=dated.pk + 5).update(pub_date=None)
+
+        self.migrate(self.after)
+        self.assertFalse(Comment.objects.filter(pub_date__isnull=True).exists())
+        self.assertEqual(Comment.objects.filter(pub_date=dated.pub_date).count(), 17)
+
+        url, seen = reverse('blog:comments_list', kwargs={'pk': post.pk}), []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page_obj']
+            seen += [comment.pk for comment in page]
+            if not page.has_next():
+                break
+            response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual(sorted(seen), list(Comment.objects.order_by('id').values_list('id', flat=True)))
+
+
+class MyPostsCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first = User.objects.create_user(username='first')
+        cls.second = User.objects.create_user(username='second')
+        cls.first_post = Post.objects.create(author=cls.first, heading='First post', text='Text',
+                                             short_definition='Short', is_published=True)
+        cls.second_post = Post.objects.create(author=cls.second, heading='Second post', text='Text',
+                                              short_definition='Short', is_published=False)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('blog:my_posts', kwargs={'pk': self.first.pk})
+
+    def my_posts(self, user):
+        self.client.force_login(user)
+        return self.client.get(self.url)
+
+    def test_each_user_sees_only_their_posts_on_the_same_url(self):
+        for _ in range(2):
+            first, second = self.my_posts(self.first), self.my_posts(self.second)
+            self.assertContains(first, 'First post')
+            self.assertNotContains(first, 'Second post')
+            self.assertContains(second, 'Second post')
+            self.assertNotContains(second, 'First post')
+
+    def test_saving_a_post_only_invalidates_its_authors_entry(self):
+        self.my_posts(self.first)
+        self.my_posts(self.second)
+        # A signal-free change stays hidden behind the second author's cached page.
+        Post.objects.filter(pk=self.second_post.pk).update(heading='Second renamed')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first_post.heading = 'First renamed'
+            self.first_post.save()
+        self.assertContains(self.my_posts(self.first), 'First renamed')
+        self.assertContains(self.my_posts(self.second), 'Second post')
+
+
+class PostPublishTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='secret')
+        cls.post = Post.objects.create(author=cls.author, heading='Heading', text='Text',
+                                       short_definition='Short', is_published=False)
+
+    def test_publish_is_one_narrow_update(self):
+        with CaptureQueriesContext(connection) as context:
+            self.post.publish()
+        # The row update, then the post is added to the search index.
+        self.assertEqual(len(context), 2)
+        self.assertTrue(context.captured_queries[0]['sql'].startswith('UPDATE "blog_post"'))
+        self.assertNotIn('"text"', context.captured_queries[0]['sql'])
+        self.assertIn('blog_search', context.captured_queries[1]['sql'])
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.is_published)
+
+    def test_publish_toggle_in_update_form_skips_full_row_write(self):
+        self.client.force_login(self.author)
+        url = reverse('blog:post_update', kwargs={'pk': self.post.pk})
+        data = {'heading': 'Heading', 'short_definition': 'Short', 'text': 'Text', 'is_published': True}
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(url, data)
+        self.assertRedirects(response, reverse('blog:index'), fetch_redirect_response=False)
+        updates = [query['sql'] for query in context.captured_queries if query['sql'].startswith('UPDATE "blog_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"text"', updates[0])
+        self.post.refresh_from_db()
+        self.assertTrue(self.post.is_published)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, heading='Gardening at night', text='Tomatoes <b>grow</b>',
+                                       short_definition='Short', is_published=True)
+        cls.draft = Post.objects.create(author=cls.author, heading='Gardening drafts', text='Text',
+                                        short_definition='Short', is_published=False)
+
+    def search(self, query, cursor=None, per_page=10):
+        return get_backend().search(query, cursor, per_page)
+
+    def test_index_follows_post_saves(self):
+        self.assertEqual([result['object_id'] for result in self.search('gardening')], [self.post.pk])
+        self.draft.publish()
+        self.assertEqual(len(self.search('gardening')), 2)
+        self.post.heading = 'Cooking at night'
+        self.post.save()
+        self.assertEqual([result['object_id'] for result in self.search('gardening')], [self.draft.pk])
+        self.draft.delete()
+        self.assertEqual(len(self.search('gardening')), 0)
+
+    @mock.patch('blog.models.notifications_for_authors.delay')
+    def test_only_published_comments_of_published_posts_are_found(self, delay):
+        comment = Comment.objects.create(author='reader', post=self.post, text='Watering tomatoes')
+        self.assertEqual(len(self.search('watering')), 0)
+        Comment.set_published(Comment.objects.filter(pk=comment.pk), True)
+        self.assertEqual([(result['kind'], result['heading']) for result in self.search('watering')],
+                         [('comment', 'Gardening at night')])
+        self.post.publish(False)
+        self.assertEqual(len(self.search('watering')), 0)
+
+    def test_ranking_highlighting_and_cursor(self):
+        Post.objects.bulk_create([
+            Post(author=self.author, heading=f'Post {number}', text='tomato ' * number, short_definition='Short',
+                 is_published=True) for number in range(1, 6)
+        ])
+        get_backend().rebuild()
+        first = self.search('tomatoes', per_page=4)
+        second = self.search('tomatoes', first.next_cursor, per_page=4)
+        results = first.object_list + second.object_list
+        self.assertEqual(len(results), 6)
+        self.assertIsNone(second.next_cursor)
+        scores = [result['score'] for result in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        snippet = next(result['snippet'] for result in results if result['object_id'] == self.post.pk)
+        self.assertIn('<mark>Tomatoes</mark> &lt;b&gt;grow&lt;/b&gt;', snippet)
+
+    def test_search_view(self):
+        response = self.client.get(reverse('blog:search'), {'q': 'night'})
+        self.assertContains(response, '<mark>night</mark>')
+        response = self.client.get(reverse('blog:search'), {'q': 'night "OR ('})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('blog:search'), {'q': 'night', 'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 404)
+
+
+class ThumbnailTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def upload(self, size=(1000, 500)):
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, (255, 0, 0, 128)).save(buffer, 'PNG')
+        return SimpleUploadedFile('picture.png', buffer.getvalue(), content_type='image/png')
+
+    def create_post(self):
+        return Post.objects.create(author=self.author, text='Text', short_definition='Short', is_published=True,
+                                   image=self.upload())
+
+    @mock.patch('blog.signals.generate_thumbnails.delay')
+    def test_upload_schedules_thumbnails_after_commit(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post()
+        delay.assert_called_once_with(post.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.publish(False)
+        delay.assert_called_once()
+
+    @mock.patch('blog.signals.generate_thumbnails.delay')
+    def test_derivatives_are_resized_and_content_hashed(self, delay):
+        post = self.create_post()
+        generate_thumbnails(post.pk)
+        post.refresh_from_db()
+        self.assertFalse(post.needs_thumbnails())
+        for image_format, pillow_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            for size, width in settings.BLOG_THUMBNAIL_SIZES.items():
+                derivative_width, name = post.thumbnails[image_format][size]
+                self.assertEqual(derivative_width, min(width, 1000))
+                with Image.open(default_storage.path(name)) as image:
+                    self.assertEqual(image.format, pillow_format)
+                    self.assertEqual(image.size, (derivative_width, derivative_width // 2))
+
+        # The same picture uploaded again reuses the same files.
+        other = self.create_post()
+        generate_thumbnails(other.pk)
+        other.refresh_from_db()
+        self.assertNotEqual(other.image.name, post.image.name)
+        self.assertEqual(other.thumbnails['webp'], post.thumbnails['webp'])
+
+    @mock.patch('blog.signals.generate_thumbnails.delay')
+    def test_force_overwrites_existing_files(self, delay):
+        post = self.create_post()
+        generate_thumbnails(post.pk)
+        post.refresh_from_db()
+        name = post.thumbnails['jpeg']['detail'][1]
+        size = default_storage.size(name)
+
+        with override_settings(BLOG_THUMBNAIL_QUALITY=10):
+            call_command('generate_thumbnails', stdout=io.StringIO())
+            self.assertEqual(default_storage.size(name), size)
+            call_command('generate_thumbnails', '--force', stdout=io.StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnails['jpeg']['detail'][1], name)
+        self.assertLess(default_storage.size(name), size)
+
+    @mock.patch('blog.signals.generate_thumbnails.delay')
+    def test_picture_tag_uses_srcset_once_generated(self, delay):
+        post = self.create_post()
+        template = Template("{% load blog_tags %}{% post_picture post 'list' 'card' %}")
+        html = template.render(Context({'post': post}))
+        self.assertIn(f'src="{post.image.url}"', html)
+        self.assertNotIn('srcset', html)
+
+        generate_thumbnails(post.pk)
+        post.refresh_from_db()
+        html = template.render(Context({'post': post}))
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn(f'src="{default_storage.url(post.thumbnails["jpeg"]["list"][1])}"', html)
+        self.assertIn('800w', html)
+
+    @mock.patch('blog.signals.generate_thumbnails.delay')
+    def test_default_image_uses_shared_static_derivatives(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(author=self.author, text='Text', short_definition='Short', is_published=True)
+        self.assertTrue(post.has_default_image)
+        delay.assert_not_called()
+        html = Template("{% load blog_tags %}{% post_picture post 'list' %}").render(Context({'post': post}))
+        self.assertIn(f'src="{staticfiles_storage.url("image/moon-200w.jpg")}"', html)
+        self.assertIn(staticfiles_storage.url('image/moon-800w.webp'), html)
+
+    @override_settings(BLOG_THUMBNAIL_SIZES={'list': 150, 'detail': 640, 'zoom': 1600})
+    def test_default_image_covers_the_configured_sizes(self):
+        self.assertEqual(thumbnails.default_thumbnails()['webp'], {
+            'list': [200, 'image/moon-200w.webp'],
+            'detail': [800, 'image/moon-800w.webp'],
+            'zoom': [800, 'image/moon-800w.webp'],
+        })
+
+
+class LeaderboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=author, text='Text', short_definition='Short', is_published=True)
+
+    def scores(self):
+        return dict(LeaderboardEntry.objects.filter(post=self.post).values_list('window', 'score'))
+
+    def age(self, comments, hours):
+        """Moves the comments, and all the activity buckets, hours into the past."""
+        CommentActivity.objects.update(hour=F('hour') - timezone.timedelta(hours=hours))
+        Comment.objects.filter(pk__in=[comment.pk for comment in comments]).update(
+            pub_date=F('pub_date') - timezone.timedelta(hours=hours))
+        for comment in comments:
+            comment.refresh_from_db()
+            comment._initial_state = comment._snapshot_state()
+
+    def publish(self, count=1):
+        return [Comment.objects.create(author='reader', post=self.post, text='Comment', is_published=True)
+                for _ in range(count)]
+
+    @mock.patch('blog.models.notification_for_admin.delay')
+    def test_publishing_counts_in_every_window(self, delay):
+        self.publish(2)
+        self.assertEqual(self.scores(), {'all': 2, '24h': 2, '7d': 2})
+
+    @mock.patch('blog.models.notification_for_admin.delay')
+    def test_unpublishing_leaves_the_hour_it_was_published_in(self, delay):
+        comment, = self.publish()
+        self.age([comment], 2)
+        comment.is_published = False
+        comment.save()
+        self.assertEqual(self.scores(), {'all': 0, '24h': 0, '7d': 0})
+        LeaderboardEntry.refresh_windows()
+        self.assertEqual(self.scores(), {'all': 0})
+
+    @mock.patch('blog.models.notification_for_admin.delay')
+    def test_bulk_unpublishing_leaves_each_comment_hour(self, delay):
+        self.age(self.publish(2), 30)
+        self.publish()
+        self.assertEqual(self.scores(), {'all': 3, '24h': 1, '7d': 3})
+        Comment.set_published(Comment.objects.all(), False)
+        self.assertEqual(self.scores(), {'all': 0, '24h': 0, '7d': 0})
+        self.assertFalse(CommentActivity.objects.exclude(published=0).exists())
+
+    @mock.patch('blog.models.notification_for_admin.delay')
+    def test_refresh_drops_activity_older_than_the_window(self, delay):
+        self.age(self.publish(), 48)
+        LeaderboardEntry.refresh_windows()
+        self.assertEqual(self.scores(), {'all': 1, '7d': 1})
+
+
+class ViewCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bulk_commands_invalidate_cached_pages(self):
+        url = reverse('blog:index')
+        self.assertContains(self.client.get(url), 'Users on site: 0')
+        # Bulk inserts skip the signals, the cached page only changes once a command invalidates it.
+        User.objects.bulk_create([User(username=f'user{number}') for number in range(3)])
+        self.assertContains(self.client.get(url), 'Users on site: 0')
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('recount', stdout=io.StringIO())
+        self.assertContains(self.client.get(url), 'Users on site: 3')
+
+    def test_feed_rerenders_only_the_changed_post_card(self):
+        author = User.objects.create_user(username='author')
+        posts = [Post.objects.create(author=author, heading=f'Post {number}', text='Text', short_definition='Short',
+                                     is_published=True) for number in range(3)]
+        url = reverse('blog:posts_list')
+
+        def rendered_cards():
+            response = self.client.get(url)
+            names = [template.name for template in response.templates]
+            # The page itself is rendered again, not served from the view cache.
+            self.assertIn('blog/posts_list.html', names)
+            return response, names.count('blog/post_card.html')
+
+        self.assertEqual(rendered_cards()[1], 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate('feed')
+        self.assertEqual(rendered_cards()[1], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            posts[1].heading = 'Renamed'
+            posts[1].save()
+        response, cards = rendered_cards()
+        self.assertEqual(cards, 1)
+        self.assertContains(response, 'Renamed')
+        self.assertContains(response, 'Post 0')
+
+    @override_settings(BLOG_SHARED_CACHE=False, BLOG_VIEW_CACHE_TIMEOUT=15)
+    def test_tags_expire_with_the_entries_in_a_per_process_cache(self):
+        with mock.patch('blog.cache.cache.set_many') as set_many:
+            tag_versions(['feed'])
+        self.assertEqual(set_many.call_args.args[1], 15)
+        with override_settings(BLOG_SHARED_CACHE=True), mock.patch('blog.cache.cache.set_many') as set_many:
+            tag_versions(['feed'])
+        self.assertIsNone(set_many.call_args.args[1])
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Text', short_definition='Short', is_published=True)
+        Comment.objects.create(author='reader', post=cls.post, text='Comment', is_published=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, response):
+        with CaptureQueriesContext(connection) as context:
+            revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        return revalidated, len(context)
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url in (reverse('blog:posts_list'), reverse('blog:post_details', kwargs={'pk': self.post.pk}),
+                    reverse('blog:comments_list', kwargs={'pk': self.post.pk})):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Last-Modified', response)
+                revalidated, queries = self.revalidate(url, response)
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated['ETag'], response['ETag'])
+                self.assertEqual(revalidated.content, b'')
+                self.assertEqual(queries, 0)
+                # A date alone never validates, no timestamp covers unpublished posts or renamed authors.
+                date = 'Fri, 01 Jan 2100 00:00:00 GMT'
+                self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=date).status_code, 200)
+
+    def test_changes_invalidate_the_validators(self):
+        url = reverse('blog:post_details', kwargs={'pk': self.post.pk})
+        response = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(author='reader', post=self.post, text='Another', is_published=True)
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 200)
+
+        url = reverse('blog:posts_list')
+        response = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.username = 'renamed'
+            self.author.save()
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 200)
+
+        response = self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.publish(False)
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 200)
+
+    def test_validators_vary_on_user_and_path(self):
+        url = reverse('blog:posts_list')
+        response = self.client.get(url)
+        self.assertNotEqual(self.client.get(url, {'cursor': ''})['ETag'], response['ETag'])
+        self.client.force_login(self.author)
+        self.assertEqual(self.revalidate(url, response)[0].status_code, 200)
+
+    def test_unpublished_post_still_redirects(self):
+        self.post.publish(False)
+        response = self.client.get(reverse('blog:post_details', kwargs={'pk': self.post.pk}))
+        self.assertRedirects(response, reverse('blog:index'), fetch_redirect_response=False)
+        self.assertNotIn('ETag', response)
+
+
+class SeedingTests(TestCase):
+
+    def seed(self, command, *args):
+        call_command(command, *map(str, args), stdout=io.StringIO())
+
+    def test_seeding_commands(self):
+        self.seed('create_users', 30, '--batch-size', 7, '--password', 'shared')
+        users = User.objects.all()
+        self.assertEqual(users.count(), 30)
+        self.assertEqual(len({user.password for user in users}), 1)
+        self.assertTrue(users[0].check_password('shared'))
+
+        self.seed('create_posts', 25, '--batch-size', 10, '--workers', 2)
+        self.seed('create_comments', 40, '--batch-size', 15)
+        self.assertEqual(Post.objects.filter(is_published=True).count(), 25)
+        self.assertEqual(sum(Post.objects.values_list('comment_count', flat=True)), 40)
+        for post in Post.objects.all():
+            self.assertEqual(post.comment_count, post.comments.count())
+        self.assertEqual(SiteCounter.as_dict(), {'users': 30, 'posts': 25, 'comments': 40})
+
+    def test_seed_makes_data_reproducible(self):
+        self.seed('create_users', 10)
+        self.seed('create_posts', 12, '--seed', 42, '--batch-size', 5)
+        self.seed('create_posts', 12, '--seed', 42, '--batch-size', 5, '--workers', 2)
+        posts = list(Post.objects.order_by('id').values_list('heading', 'author_id'))
+        self.assertEqual(posts[:12], posts[12:])
+
+    def test_seed_dataset_shapes_the_data(self):
+        self.seed('seed_dataset', '--users', 20, '--posts', 200, '--comments', 2000, '--published', 0.8,
+                  '--years', 2, '--seed', 1, '--batch-size', 500)
+        self.assertEqual(SiteCounter.as_dict(), {'users': 20, 'posts': 200, 'comments': 2000})
+        self.assertTrue(Post.objects.filter(is_published=False).exists())
+        self.assertTrue(Comment.objects.filter(is_published=False).exists())
+        self.assertFalse(Comment.objects.filter(post__is_published=False).exists())
+        self.assertFalse(Comment.objects.filter(pub_date__lt=F('post__pub_date')).exists())
+        self.assertLess(Post.objects.earliest('pub_date').pub_date, timezone.now() - timezone.timedelta(days=365))
+
+        counts = sorted(Post.objects.values_list('comment_count', flat=True), reverse=True)
+        self.assertEqual(sum(counts), 2000)
+        # Power law: the top tenth of the posts gets most of the comments.
+        self.assertGreater(sum(counts[:20]), 1000)
+        self.assertTrue(LeaderboardEntry.objects.exists())
+
+
+class DumpTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_export_and_import_round_trip(self):
+        change_post = Permission.objects.get(codename='change_post')
+        delete_comment = Permission.objects.get(codename='delete_comment')
+        group = Group.objects.create(name='editors')
+        group.permissions.add(change_post)
+        author = User.objects.create_user(username='author', password='secret')
+        author.groups.add(group)
+        author.user_permissions.add(delete_comment)
+        posts = [Post.objects.create(author=author, heading=f'Post {number}', text='Text', short_definition='Short',
+                                     is_published=True) for number in range(7)]
+        for post in posts:
+            for _ in range(3):
+                Comment.objects.create(author='reader', post=post, text='Comment', is_published=True)
+        expected = {
+            'users': list(User.objects.values_list('id', 'username', 'password', 'date_joined')),
+            'posts': list(Post.objects.values_list('id', 'author_id', 'heading', 'pub_date')),
+            'comments': list(Comment.objects.values_list('id', 'post_id', 'pub_date')),
+        }
+
+        path = os.path.join(self.directory, 'blog.jsonl.gz')
+        call_command('export_blog', path, '--chunk-size', 4, stdout=io.StringIO())
+        with open_dump(path, 'r') as dump:
+            exported = next(json.loads(line) for line in dump if '"auth.user"' in line)
+        # Permission pks differ between databases, the dump refers to them by natural key.
+        self.assertEqual(exported['fields']['user_permissions'], [['delete_comment', 'blog', 'comment']])
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        with CaptureQueriesContext(connection) as context:
+            call_command('import_blog', path, '--chunk-size', 5, '--skip-derived', stdout=io.StringIO())
+        # A handful of bulk inserts per chunk, not a query per row.
+        self.assertLess(len(context), 25)
+
+        self.assertEqual(list(User.objects.values_list('id', 'username', 'password', 'date_joined')), expected['users'])
+        self.assertEqual(list(Post.objects.values_list('id', 'author_id', 'heading', 'pub_date')), expected['posts'])
+        self.assertEqual(list(Comment.objects.values_list('id', 'post_id', 'pub_date')), expected['comments'])
+        author = User.objects.get(username='author')
+        self.assertEqual(list(author.groups.values_list('id', 'name')), [(group.id, 'editors')])
+        self.assertEqual(list(author.groups.get().permissions.all()), [change_post])
+        self.assertEqual(list(author.user_permissions.all()), [delete_comment])
+
+    def test_import_refuses_tables_with_rows(self):
+        User.objects.create_user(username='author')
+        path = os.path.join(settings.BASE_DIR, 'database.jsonl')
+        with self.assertRaisesMessage(CommandError, 'auth.user already have rows'):
+            call_command('import_blog', path, stdout=io.StringIO())
+        self.assertFalse(Post.objects.exists())
+
+    def test_import_rebuilds_derived_data(self):
+        path = os.path.join(settings.BASE_DIR, 'database.jsonl')
+        call_command('import_blog', path, stdout=io.StringIO())
+        self.assertEqual(SiteCounter.as_dict(), {'users': 100, 'posts': 200, 'comments': 1000})
+        self.assertEqual(sum(Post.objects.values_list('comment_count', flat=True)), 1000)
+        self.assertTrue(LeaderboardEntry.objects.exists())
+
+
+class ProfilingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author', password='secret')
+        cls.post = Post.objects.create(author=author, heading='Post', text='Text', short_definition='Short',
+                                       is_published=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_server_timing_reports_queries_templates_and_cache(self):
+        url = reverse('blog:comments_list', kwargs={'pk': self.post.pk})
+        with CaptureQueriesContext(connection) as context:
+            timing = self.client.get(url).headers['Server-Timing']
+        self.assertIn(f'desc="{len(context)} queries"', timing)
+        self.assertIn('cache;desc="miss"', timing)
+        self.assertRegex(timing, r'tpl;dur=[1-9]|tpl;dur=0\.\d*[1-9]')
+
+        timing = self.client.get(url).headers['Server-Timing']
+        self.assertIn('cache;desc="hit"', timing)
+        self.assertIn('tpl;dur=0.00', timing)
+
+    @override_settings(BLOG_SERVER_TIMING=False)
+    def test_server_timing_can_be_turned_off(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('blog:index')).headers)
+
+    @override_settings(BLOG_SLOW_REQUEST_MS=0, BLOG_SLOW_REQUEST_SAMPLE_RATE=1)
+    def test_slow_requests_are_traced(self):
+        with self.assertLogs('blog.performance', 'WARNING') as logs:
+            self.client.get(reverse('blog:post_details', kwargs={'pk': self.post.pk}))
+        trace = json.loads(logs.records[0].getMessage())
+        self.assertEqual(trace['view'], 'blog:post_details')
+        self.assertEqual(trace['status'], 200)
+        self.assertEqual(len(trace['slowest_queries']), min(trace['queries'], 5))
+        self.assertGreater(trace['template_ms'], 0)
+
+    @override_settings(BLOG_SLOW_REQUEST_MS=0, BLOG_SLOW_REQUEST_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_traced(self):
+        with self.assertNoLogs('blog.performance'):
+            self.client.get(reverse('blog:index'))
+
+
+class BenchmarkTests(TestCase):
+
+    def test_every_route_has_a_scenario(self):
+        names = {f'{urls.app_name}:{pattern.name}' for pattern in urls.urlpatterns}
+        self.assertEqual(names, {scenario[1] for scenario in benchmarks.SCENARIOS})
+
+    def test_scenarios_run_on_a_seeded_dataset(self):
+        call_command('seed_dataset', users=5, posts=40, comments=300, seed=3, stdout=io.StringIO())
+        context = benchmarks.prepare()
+        self.assertTrue(context['posts_cursor'] and context['comments_cursor'])
+        logged_in = Client()
+        logged_in.force_login(context['author'])
+
+        results = benchmarks.run(Client(), logged_in, context, requests=2, warmup=0)
+        self.assertEqual(list(results), [scenario[0] for scenario in benchmarks.SCENARIOS])
+        self.assertGreater(results['posts_list deep']['cold']['queries'], 0)
+        self.assertEqual(results['index']['warm']['requests'], 2)
+
+    def test_compare_reports_extra_queries_and_slowdowns(self):
+        def result(p50, queries):
+            stats = {'p50': p50, 'p95': p50, 'queries': queries}
+            return {'small': {'dataset': {'posts': 10}, 'routes': {'index': {'cold': stats, 'warm': stats}}}}
+
+        self.assertEqual(benchmarks.compare(result(10, 2), result(11.5, 2)), [])
+        self.assertEqual(benchmarks.compare(result(1, 2), result(1.5, 2)), [])
+        self.assertEqual(len(benchmarks.compare(result(10, 2), result(13, 2))), 4)
+        self.assertEqual(len(benchmarks.compare(result(10, 2), result(10, 3))), 2)
+        changed = result(13, 3)
+        changed['small']['dataset'] = {'posts': 20}
+        self.assertEqual(benchmarks.compare(result(10, 2), changed), [])
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Maximum number of queries per view and HTTP method, on a cold cache. A view going over its
+    budget usually means an N+1 query or a redundant save slipped in.
+    """
+    budgets = [
+        # (url name, method, logged in, data, budget)
+        ('blog:index', 'get', False, None, 2),
+        ('blog:registration_form', 'get', False, None, 0),
+        ('blog:registration_form', 'post', False, {
+            'username': 'newcomer', 'email': 'newcomer@example.com',
+            'password1': 'Very-secret-42', 'password2': 'Very-secret-42',
+        }, 4),
+        ('blog:posts_list', 'get', False, None, 2),
+        ('blog:posts_list', 'get', True, None, 4),
+        ('blog:post_create_form', 'get', True, None, 2),
+        ('blog:post_create_form', 'post', True, {
+            'heading': 'New', 'short_definition': 'Short', 'text': 'Text', 'is_published': True,
+        }, 7),
+        ('blog:post_details', 'get', False, None, 2),
+        ('blog:post_details', 'post', False, {'author': 'reader', 'text': 'Comment'}, 8),
+        ('blog:author_info', 'get', False, None, 2),
+        ('blog:my_posts', 'get', True, None, 4),
+        ('blog:post_update', 'get', True, None, 3),
+        ('blog:post_update', 'post', True, {
+            'heading': 'Changed', 'short_definition': 'Short', 'text': 'Text', 'is_published': True,
+        }, 5),
+        ('blog:comments_list', 'get', False, None, 2),
+        ('blog:comments_feed', 'get', False, None, 1),
+        ('blog:profile_update', 'get', True, None, 2),
+        ('blog:send_feedback', 'get', False, None, 0),
+        ('blog:search', 'get', False, {'q': 'post'}, 1),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', email='author@example.com', password='secret')
+        cls.posts = Post.objects.bulk_create([
+            Post(author=cls.author, heading=f'Post {number}', text='Text', short_definition='Short', is_published=True)
+            for number in range(10)
+        ])
+        Comment.objects.bulk_create([
+            Comment(author='reader', post=post, text='Comment', is_published=True)
+            for post in cls.posts for _ in range(5)
+        ])
+
+    def url_kwargs(self, name):
+        if name in ('blog:registration_form', 'blog:index', 'blog:posts_list', 'blog:send_feedback', 'blog:search'):
+            return {}
+        if name in ('blog:post_create_form', 'blog:author_info', 'blog:my_posts', 'blog:profile_update'):
+            return {'pk': self.author.pk}
+        return {'pk': self.posts[0].pk}
+
+    def test_views_stay_within_query_budget(self):
+        for name, method, logged_in, data, budget in self.budgets:
+            with self.subTest(view=name, method=method, logged_in=logged_in):
+                cache.clear()
+                self.client.logout()
+                if logged_in:
+                    self.client.force_login(self.author)
+                url = reverse(name, kwargs=self.url_kwargs(name))
+                with CaptureQueriesContext(connection) as context:
+                    response = getattr(self.client, method)(url, data)
+                self.assertLess(response.status_code, 400)
+                queries = '\n'.join(query['sql'] for query in context.captured_queries)
+                self.assertLessEqual(len(context), budget, f'{len(context)} queries:\n{queries}')
@@ -0,0 +1,106 @@
+import hashlib
+import io
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+FORMATS = {
+    # format: (Pillow format, extension, content type)
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+}
+
+# Widths of the prebuilt derivatives of Post.DEFAULT_IMAGE, shipped as static files so that all
+# the posts without an image of their own share the same hashed URLs.
+DEFAULT_IMAGE_WIDTHS = (200, 400, 800)
+
+
+def sizes():
+    return settings.BLOG_THUMBNAIL_SIZES
+
+
+def default_thumbnails():
+    """The derivatives of the default image, each size served by the narrowest prebuilt width covering it."""
+    widths = {size: min((prebuilt for prebuilt in DEFAULT_IMAGE_WIDTHS if prebuilt >= width),
+                        default=DEFAULT_IMAGE_WIDTHS[-1])
+              for size, width in sizes().items()}
+    return {
+        image_format: {size: [width, f'image/moon-{width}w.{extension}'] for size, width in widths.items()}
+        for image_format, (_, extension, _) in FORMATS.items()
+    }
+
+
+def derivative_name(digest, width, extension):
+    return f'thumbnails/{digest[:2]}/{digest}-{width}w.{extension}'
+
+
+def flatten(image):
+    """JPEG has no alpha channel, transparent areas are put on white instead of black."""
+    if image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image
+
+
+def encode(image, image_format):
+    buffer = io.BytesIO()
+    pillow_format = FORMATS[image_format][0]
+    if pillow_format == 'JPEG':
+        flatten(image).save(buffer, pillow_format, quality=settings.BLOG_THUMBNAIL_QUALITY, optimize=True,
+                            progressive=True)
+    else:
+        image.save(buffer, pillow_format, quality=settings.BLOG_THUMBNAIL_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def generate(image_file, overwrite=False):
+    """
+    Writes the resized WebP and JPEG derivatives of an image and returns them as
+    {'source': name, 'webp': {size: [width, name]}, 'jpeg': {size: [width, name]}}.
+    Names are derived from the source content, so the same upload is only processed once and
+    the files can be served with far-future cache headers. overwrite re-encodes existing files,
+    e.g. after a quality change.
+    """
+    with image_file.open('rb') as source:
+        content = source.read()
+    digest = hashlib.sha256(content).hexdigest()[:32]
+
+    image = Image.open(io.BytesIO(content))
+    # JPEGs are decoded at a reduced scale right away when that still covers the widest size.
+    image.draft('RGB', (max(sizes().values()),) * 2)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+    derivatives = {'source': image_file.name, **{image_format: {} for image_format in FORMATS}}
+    written = set()
+    for size, width in sorted(sizes().items(), key=lambda item: item[1]):
+        # Never upscale, a size wider than the source reuses the source resolution.
+        width = min(width, image.width)
+        resized = None
+        for image_format, (_, extension, _) in FORMATS.items():
+            name = derivative_name(digest, width, extension)
+            if name not in written and (overwrite or not default_storage.exists(name)):
+                if resized is None:
+                    resized = image.resize((width, max(1, round(image.height * width / image.width))),
+                                           Image.LANCZOS, reducing_gap=3.0)
+                # The storage would save under another name rather than replace the file.
+                default_storage.delete(name)
+                name = default_storage.save(name, ContentFile(encode(resized, image_format)))
+                written.add(name)
+            derivatives[image_format][size] = [width, name]
+    return derivatives
+
+
+def srcset(derivatives, image_format, url=None):
+    url = url or default_storage.url
+    urls = {width: url(name) for width, name in derivatives.get(image_format, {}).values()}
+    return ', '.join(f'{url} {width}w' for width, url in sorted(urls.items()))
+
+
+def src(derivatives, size, image_format='jpeg', url=None):
+    return (url or default_storage.url)(derivatives[image_format][size][1])
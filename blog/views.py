@@ -1,34 +1,57 @@
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db.models import Count
-from django.db.models import Prefetch
 from django.http import Http404, JsonResponse
 from django.shortcuts import redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
 from django.views import View, generic
-from django.views.decorators.cache import cache_page
 from django.views.generic import FormView
 from django.views.generic.detail import SingleObjectMixin
 
+from . import services
+from .cache import cache_view, conditional_view, tag_versions
 from .forms import CommentForm, FeedbackForm, PostForm, RegisterForm
-from .models import Comment, Post, User
-from .tasks import notification_for_admin, send_feedback_to_admin
+from .models import Comment, LeaderboardEntry, Post, SiteCounter, User
+from .pagination import KeysetPaginationMixin, KeysetPaginator
+from .search import InvalidSearchCursor, get_backend
+from .tasks import send_feedback_to_admin
 
 
-@cache_page(15)
+def author_tags(request, *args, **kwargs):
+    return [f'author:{request.user.id}']
+
+
+def post_tags(request, *args, **kwargs):
+    return [f'post:{kwargs["pk"]}']
+
+
+def post_page_tags(request, *args, **kwargs):
+    return ['feed', f'post:{kwargs["pk"]}']
+
+
+@cache_view(settings.BLOG_VIEW_CACHE_TIMEOUT, ['feed', 'comments', 'users'])
 def index(request):
-    users = User.objects.filter(is_staff=False, is_superuser=False).aggregate(Count('id'))
-    posts = Post.objects.aggregate(Count('id'))
-    comments = Comment.objects.aggregate(Count('id'))
-    most_commented_posts = Comment.objects.values('post', 'post__heading').annotate(comments=Count('post')).order_by(
-        '-comments')[:5]
-    return render(request, 'blog/index.html', {'users': users,
-                                               'posts': posts,
-                                               'comments': comments,
-                                               'most_commented_posts': most_commented_posts})
+    counters = SiteCounter.as_dict()
+    window = request.GET.get('window', 'all')
+    if window not in LeaderboardEntry.windows():
+        window = 'all'
+    return render(request, 'blog/index.html', {'counters': counters,
+                                               'most_commented_posts': LeaderboardEntry.top(window, 5)})
+
+
+@cache_view(settings.BLOG_VIEW_CACHE_TIMEOUT, ['feed', 'comments'])
+def search(request):
+    query = request.GET.get('q', '')
+    try:
+        page = get_backend().search(query, request.GET.get('cursor'), per_page=10)
+    except InvalidSearchCursor:
+        raise Http404('Invalid cursor.')
+    return render(request, 'blog/search.html', {'query': query, 'page_obj': page})
 
 
 class UserRegistrationView(SuccessMessageMixin, generic.FormView):
@@ -39,8 +62,7 @@ class UserRegistrationView(SuccessMessageMixin, generic.FormView):
     success_message = 'Welcome to our blog!!!'
 
     def form_valid(self, form):
-        user = form.save()
-        user.save()
+        services.register_user(form)
         return super().form_valid(form)
 
 
@@ -70,23 +92,15 @@ class AuthorDetail(generic.DetailView):
         return context
 
 
-class PostCreate(LoginRequiredMixin, SuccessMessageMixin, generic.CreateView):
+class PostCreate(LoginRequiredMixin, generic.CreateView):
     model = Post
-    fields = ['heading', 'short_definition', 'text', 'image', 'is_published']
+    form_class = PostForm
     template_name = 'blog/post_form.html'
 
-    def post(self, request, *args, **kwargs):
-        post_form = PostForm(request.POST, request.FILES)
-        if post_form.is_valid():
-            post_form.instance.author = self.request.user
-            is_published = post_form.cleaned_data['is_published']
-            post_form.instance.is_published = is_published
-            new_post = post_form.save()
-            new_post.save()
-            messages.success(self.request, 'Your post has been successfully created!!!')
-            notification_for_admin.delay(notif='post')
-            return redirect('blog:posts_list')
-        return super().post(request, *args, **kwargs)
+    def form_valid(self, post_form):
+        services.create_post(post_form, self.request.user)
+        messages.success(self.request, 'Your post has been successfully created!!!')
+        return redirect('blog:posts_list')
 
 
 class MyPostUpdate(LoginRequiredMixin, SuccessMessageMixin, generic.UpdateView):
@@ -103,36 +117,58 @@ class MyPostUpdate(LoginRequiredMixin, SuccessMessageMixin, generic.UpdateView):
         return post_initial
 
     def form_valid(self, post_form):
-        post_form.instance.author = self.request.user
-        is_published = post_form.cleaned_data['is_published']
-        post_form.instance.is_published = is_published
-        return super().form_valid(post_form)
+        self.object = services.update_post(post_form)
+        messages.success(self.request, self.get_success_message(post_form.cleaned_data))
+        return redirect(self.get_success_url())
 
 
-class PostDetails(generic.DetailView):
-    model = Post
-    template_name = 'blog/post_details.html'
+def get_request_post(request, pk):
+    """Loads the post once per request, so every view handling the request shares the same instance."""
+    posts = request.__dict__.setdefault('_blog_posts', {})
+    if pk not in posts:
+        posts[pk] = Post.objects.select_related('author').filter(pk=pk).first()
+    return posts[pk]
 
-    def dispatch(self, request, *args, **kwargs):
-        post = Post.objects.get(id=self.kwargs['pk'])
-        if not post.is_published:
-            messages.warning(self.request, "This post isn't published, or doesn't exist!!!")
-            return redirect('blog:index')
-        return super().dispatch(request, *args, **kwargs)
 
-    def get_queryset(self):
-        return Post.objects.select_related('author').prefetch_related(
-            Prefetch('comments', Comment.objects.filter(is_published=True).order_by('-pub_date'))
-        )
+class PostThreadMixin:
+    context_object_name = 'post'
+    comments_per_page = 10
+
+    def unavailable(self):
+        messages.warning(self.request, "This post isn't published, or doesn't exist!!!")
+        return redirect('blog:index')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['form'] = CommentForm()
+        context.setdefault('form', CommentForm())
+        # Only the newest comments are embedded, the rest is loaded page by page from CommentsFeed.
+        # Evaluated lazily, only when the cached comment thread fragment is rebuilt.
+        paginator = KeysetPaginator(Comment.objects.filter(post=self.object, is_published=True),
+                                    self.comments_per_page)
+        context['comments_page'] = SimpleLazyObject(paginator.page)
+        context['thread_version'] = tag_versions([f'post:{self.object.pk}'])[0]
+        context['thread_cache_timeout'] = settings.BLOG_VIEW_CACHE_TIMEOUT
         return context
 
 
-@method_decorator(cache_page(15), name='dispatch')
-class PostList(generic.ListView):
+@method_decorator(conditional_view(post_page_tags), name='dispatch')
+class PostDetails(PostThreadMixin, generic.DetailView):
+    model = Post
+    template_name = 'blog/post_details.html'
+
+    def get_object(self, queryset=None):
+        return get_request_post(self.request, self.kwargs['pk'])
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if self.object is None or not self.object.is_published:
+            return self.unavailable()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+@method_decorator(conditional_view(['feed']), name='dispatch')
+@method_decorator(cache_view(settings.BLOG_VIEW_CACHE_TIMEOUT, ['feed']), name='dispatch')
+class PostList(KeysetPaginationMixin, generic.ListView):
     model = Post
     template_name = 'blog/posts_list.html'
     paginate_by = 3
@@ -140,9 +176,14 @@ class PostList(generic.ListView):
     def get_queryset(self):
         return Post.objects.select_related('author').filter(is_published=True).order_by('-pub_date')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['card_cache_timeout'] = settings.BLOG_VIEW_CACHE_TIMEOUT
+        return context
+
 
-@method_decorator(cache_page(15), name='dispatch')
-class MyPostsListView(LoginRequiredMixin, generic.ListView):
+@method_decorator(cache_view(settings.BLOG_VIEW_CACHE_TIMEOUT, author_tags), name='dispatch')
+class MyPostsListView(LoginRequiredMixin, KeysetPaginationMixin, generic.ListView):
     model = Post
     template_name = 'blog/my_posts_list.html'
     paginate_by = 5
@@ -151,25 +192,29 @@ class MyPostsListView(LoginRequiredMixin, generic.ListView):
         return Post.objects.filter(author__id=self.request.user.id).order_by('-pub_date')
 
 
-class CommentFormView(SuccessMessageMixin, SingleObjectMixin, FormView):
-    model = Comment
+class CommentFormView(PostThreadMixin, SuccessMessageMixin, SingleObjectMixin, FormView):
+    model = Post
     form_class = CommentForm
     template_name = 'blog/post_details.html'
 
+    def get_object(self, queryset=None):
+        return get_request_post(self.request, self.kwargs['pk'])
+
     def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if self.object is None or not self.object.is_published:
+            return self.unavailable()
         comment_form = CommentForm(request.POST)
         if comment_form.is_valid():
-            text = comment_form.cleaned_data['text']
-            author = comment_form.cleaned_data['author']
-            new_comment = Comment(text=text, author=author, post_id=kwargs['pk'])
-            new_comment.save()
+            services.add_comment(self.object, comment_form.cleaned_data['author'], comment_form.cleaned_data['text'])
             messages.success(self.request, "Your comment will be added soon!")
-            notification_for_admin.delay(notif='comment')
-            return redirect('blog:post_details', pk=kwargs['pk'])
-        return super().post(request, *args, **kwargs)
+            return redirect('blog:post_details', pk=self.object.pk)
+        return self.form_invalid(comment_form)
 
 
-class CommentsList(generic.ListView):
+@method_decorator(conditional_view(post_tags), name='dispatch')
+@method_decorator(cache_view(settings.BLOG_VIEW_CACHE_TIMEOUT, post_tags), name='dispatch')
+class CommentsList(KeysetPaginationMixin, generic.ListView):
     model = Comment
     template_name = 'blog/comments_list.html'
     paginate_by = 10
@@ -178,6 +223,21 @@ class CommentsList(generic.ListView):
         return Comment.objects.filter(post_id=self.kwargs['pk'], is_published=True).order_by('-pub_date')
 
 
+class CommentsFeed(CommentsList):
+    paginate_with_count = False
+
+    def get_queryset(self):
+        return super().get_queryset().only('id', 'author', 'text', 'pub_date')
+
+    def render_to_response(self, context, **response_kwargs):
+        page = context['page_obj']
+        return JsonResponse({
+            'comments': [{'author': comment.author, 'text': comment.text, 'pub_date': comment.pub_date}
+                         for comment in page],
+            'next_cursor': page.next_cursor,
+        })
+
+
 class PostView(View):
 
     def get(self, request, *args, **kwargs):
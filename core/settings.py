@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
 
     'django_extensions',
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'blog.profiling.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -66,7 +69,9 @@ ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, with render times for PerformanceMiddleware
+        'BACKEND': 'blog.profiling.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -92,6 +97,17 @@ DATABASES = {
     }
 }
 
+# Cache
+# View cache entries, invalidation tags and their metrics need to be shared between processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    } if 'REDIS_URL' in os.environ else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -126,6 +142,82 @@ CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
 
+# New posts and comments are collected and mailed to the admin as one digest per interval,
+# or as soon as the threshold of pending notifications is reached
+BLOG_ADMIN_DIGEST = True
+BLOG_ADMIN_DIGEST_INTERVAL = 5 * 60
+BLOG_ADMIN_DIGEST_THRESHOLD = 100
+BLOG_SITE_URL = os.environ.get('BLOG_SITE_URL', 'http://localhost:8000')
+
+CELERY_BEAT_SCHEDULE = {
+    'refresh-leaderboard': {
+        'task': 'blog.tasks.refresh_leaderboard',
+        'schedule': 10 * 60,
+    },
+    'send-admin-digest': {
+        'task': 'blog.tasks.send_admin_digest',
+        'schedule': BLOG_ADMIN_DIGEST_INTERVAL,
+    },
+}
+
+# Cached views are invalidated by tags on every change, so they can be cached for long, as long as
+# the web workers, Celery and the management commands share the cache. With the per-process LocMemCache,
+# the invalidations made by the other processes never arrive and pages are only cached briefly
+BLOG_SHARED_CACHE = 'REDIS_URL' in os.environ
+BLOG_VIEW_CACHE_TIMEOUT = 6 * 60 * 60 if BLOG_SHARED_CACHE else 15
+
+# Top posts leaderboard windows, in hours (None means all time)
+BLOG_LEADERBOARD_WINDOWS = {
+    'all': None,
+    '24h': 24,
+    '7d': 24 * 7,
+}
+
+# Post image derivatives, by size name and width in pixels, generated as WebP and JPEG
+BLOG_THUMBNAIL_SIZES = {
+    'list': 200,
+    'detail': 400,
+    'retina': 800,
+}
+BLOG_THUMBNAIL_QUALITY = 80
+
+# Full-text search backend class, None picks FTS5 on SQLite and tsvector on PostgreSQL
+BLOG_SEARCH_BACKEND = None
+
+# Per-request profiling: a Server-Timing header on every response, and a JSON trace of the
+# sampled requests slower than the threshold, in milliseconds, logged to slow_requests.log
+BLOG_SERVER_TIMING = True
+BLOG_SLOW_REQUEST_MS = 500
+BLOG_SLOW_REQUEST_SAMPLE_RATE = 0.1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'trace': {
+            'format': '{asctime} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.environ.get('BLOG_SLOW_REQUEST_LOG', BASE_DIR / 'slow_requests.log'),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'trace',
+        },
+    },
+    'loggers': {
+        'blog.performance': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Emails
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
@@ -136,6 +228,21 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = (
     os.path.join(BASE_DIR, 'static/'),
 )
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# Static files get content-hashed names and precompressed copies on collectstatic,
+# WhiteNoise serves the hashed ones as immutable
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Tests run without DEBUG, against static files under their plain names
+TEST_RUNNER = 'blog.testing.TestRunner'
 
 # Media
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -0,0 +1,27 @@
+$(function () {
+  var loadComments = function () {
+    var btn = $(this);
+    $.ajax({
+      url: btn.attr("data-url"),
+      data: {cursor: btn.attr("data-cursor")},
+      type: 'get',
+      dataType: 'json',
+      success: function (data) {
+        var thread = $(".js-comments");
+        $.each(data.comments, function (index, comment) {
+          thread.append($("<span>").append($("<strong>").text(comment.author)), "<br>");
+          thread.append($("<p>", {"class": "margin_bottom_24"}).text(comment.text), "<br>");
+        });
+        if (data.next_cursor) {
+          btn.attr("data-cursor", data.next_cursor);
+        }
+        else {
+          btn.remove();
+        }
+      }
+    });
+  };
+
+  $(".js-load-comments").click(loadComments);
+
+});